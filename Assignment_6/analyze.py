@@ -8,35 +8,131 @@ import pyqtgraph.flowchart.library as fclib
 from pyqtgraph.Qt import QtGui, QtCore
 import pyqtgraph as pg
 import numpy as np
+import os
 import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, 'common'))  # shared modules
+import wiimote_sim
+wiimote_sim.install_if_requested()  # WIIMOTE_SIM=<signal> simulates it
 import wiimote
 import wiimote_node
+import analyze_nodes
+import node_profiler
 
 WM_ADDRESS = "18:2A:7B:F3:F8:F5"  # default address
 
+FPS = 30  # frame rate of the plots
+
 
 class CustomNormalVectorNode(CtrlNode):
+    """
+    normal vectors, pitch and roll of whole blocks of accelerometer samples,
+    e.g. the windows of RingBuffers' dataOut
+
+    a block is computed with a few vectorized numpy calls writing into
+    buffers that are reused between updates and only grow if a larger block
+    arrives; the outputs are views into them. x_rotation_out and
+    z_rotation_out are the lines from the origin to the x and z components
+    of the mean normal vector of the block for the orientation plot, which
+    smooths the display over the window
+    """
+
     nodeName = "CustomNormalVector"
 
-    uiTemplate = []  # required; even empty; endless recursion otherwise o.O
+    uiTemplate = [
+        ('center', 'intSpin', {'value': 512, 'min': 0, 'max': 1023})
+    ]
 
     def __init__(self, node_name):
         terminals = {
             'x_axis_in': dict(io='in'),
+            'y_axis_in': dict(io='in'),
             'z_axis_in': dict(io='in'),
             'x_rotation_out': dict(io='out'),
-            'z_rotation_out': dict(io='out')
+            'z_rotation_out': dict(io='out'),
+            'normal_out': dict(io='out'),
+            'pitch_out': dict(io='out'),
+            'roll_out': dict(io='out')
         }
 
+        self.normals = np.zeros((0, 3))
+        self.lengths = np.zeros(0)
+        self.pitch = np.zeros(0)
+        self.roll = np.zeros(0)
+
+        self.mean_normal = np.zeros(3)
+        self.x_rotation = np.zeros(2)
+        self.z_rotation = np.zeros(2)
+
         CtrlNode.__init__(self, node_name, terminals=terminals)
 
-    def process(self, **kwds):
+    def reserve(self, n):
+        """
+        grows the buffers to hold at least n samples
+
+        :param n: the amount of samples of a block
+        :return: void
+        """
+
+        if n <= len(self.lengths):
+            return
+
+        size = max(n, 2 * len(self.lengths))
+
+        self.normals = np.zeros((size, 3))
+        self.lengths = np.zeros(size)
+        self.pitch = np.zeros(size)
+        self.roll = np.zeros(size)
+
+    def process(self, x_axis_in, y_axis_in, z_axis_in, display=True):
+        if x_axis_in is None or z_axis_in is None:
+            return {}
+
+        x = np.ravel(x_axis_in)
+        n = len(x)
+
+        if n == 0:
+            return {}
+
+        self.reserve(n)
+
+        center = self.ctrls['center'].value()
 
-        out = [kwds['x_axis_in'] - 512, kwds['z_axis_in'] - 512]
+        normals = self.normals[:n]
+        lengths = self.lengths[:n]
+        pitch = self.pitch[:n]
+        roll = self.roll[:n]
+
+        normals[:, 0] = x
+        # without a y axis the vector lies in the x-z plane
+        normals[:, 1] = center if y_axis_in is None else np.ravel(y_axis_in)
+        normals[:, 2] = np.ravel(z_axis_in)
+        normals -= center
+
+        np.einsum('ij,ij->i', normals, normals, out=lengths)
+        np.sqrt(lengths, out=lengths)
+        np.maximum(lengths, 1e-9, out=lengths)
+        np.divide(normals, lengths[:, np.newaxis], out=normals)
+
+        np.hypot(normals[:, 1], normals[:, 2], out=pitch)
+        np.arctan2(normals[:, 0], pitch, out=pitch)
+        np.degrees(pitch, out=pitch)
+
+        np.arctan2(normals[:, 1], normals[:, 2], out=roll)
+        np.degrees(roll, out=roll)
+
+        np.mean(normals, axis=0, out=self.mean_normal)
+        self.mean_normal /= max(np.linalg.norm(self.mean_normal), 1e-9)
+
+        self.x_rotation[1] = self.mean_normal[0]
+        self.z_rotation[1] = self.mean_normal[2]
 
         return {
-            'x_rotation_out': np.array([0, out[0]]),
-            'z_rotation_out': np.array([0, out[1]])
+            'x_rotation_out': self.x_rotation,
+            'z_rotation_out': self.z_rotation,
+            'normal_out': normals,
+            'pitch_out': pitch,
+            'roll_out': roll
         }
 
 
@@ -78,13 +174,15 @@ def setup_node(fc, node_name, x, y, pw=None):
     :param node_name: the name of the target node to construct
     :param x: the x-position in the flowchart
     :param y: the y-position in the flowchart
-    :param pw: a PlotWidget, if a PlotWidget-Node is to be constructed
+    :param pw: a PlotWidget, if a PlotWidget-, FramePlot-, HistoryPlot- or
+               Spectrogram-Node is to be constructed
     :param wm_address: the mac address to the wiimote
     :return: the newly constructed node
     """
     node = fc.createNode(node_name, pos=(x, y))
 
-    if pw and node_name == 'PlotWidget':
+    if pw and node_name in ['PlotWidget', 'FramePlot', 'HistoryPlot',
+                            'Spectrogram']:
         node.setPlot(pw)
 
     return node
@@ -121,16 +219,16 @@ def get_plot_widget_nodes(fc, layout):
 
     :param fc: the flowchart receiving the nodes
     :param layout: the layout receiving the PlotWidget objects
-    :return: the 3 PlotWidgets-Nodes responsible for plotting the accelerometer
-             data and the PlotWidget for the NormalVectorNode(WIP)
+    :return: the 3 HistoryPlot-Nodes responsible for plotting the
+             accelerometer data
     """
     pwx = add_plot_widget_to_layout(layout, 0, 1)
     pwy = add_plot_widget_to_layout(layout, 1, 1)
     pwz = add_plot_widget_to_layout(layout, 2, 1)
 
-    pw_x_node = setup_node(fc, 'PlotWidget', 300, 0, pwx)
-    pw_y_node = setup_node(fc, 'PlotWidget', 300, 150, pwy)
-    pw_z_node = setup_node(fc, 'PlotWidget', 300, -150, pwz)
+    pw_x_node = setup_node(fc, 'HistoryPlot', 300, 0, pwx)
+    pw_y_node = setup_node(fc, 'HistoryPlot', 300, 150, pwy)
+    pw_z_node = setup_node(fc, 'HistoryPlot', 300, -150, pwz)
 
     return pw_x_node, pw_y_node, pw_z_node
 
@@ -152,20 +250,22 @@ def main():
     wiimote_node_ = setup_node(fc, 'Wiimote', 0, 0)
     wiimote_node_.text.setText(sys.argv[1])
 
-    buffer_node_x = setup_node(fc, 'Buffer', 150, 0)
-    buffer_node_y = setup_node(fc, 'Buffer', 150, 150)
-    buffer_node_z = setup_node(fc, 'Buffer', 150, -150)
+    buffer_node_x = setup_node(fc, 'RingBuffer', 150, 0)
+    buffer_node_y = setup_node(fc, 'RingBuffer', 150, 150)
+    buffer_node_z = setup_node(fc, 'RingBuffer', 150, -150)
 
-    filter_node_mean = setup_node(fc, 'MeanFilter', 0, -300)
-    filter_node_median = setup_node(fc, 'MedianFilter', 300, -300)
-    filter_node_gaussian = setup_node(fc, 'GaussianFilter', 150, -300)
+    filter_node_mean, filter_node_gaussian, filter_node_median = \
+        analyze_nodes.setup_filter_nodes(fc)
 
+    # the buffers keep the last raw samples of every axis; the filters work
+    # on their new samples only, and the plots keep the filtered history in
+    # a min/max pyramid and draw one pair per pixel column
     fc.connectTerminals(wiimote_node_['accelX'], buffer_node_x['dataIn'])
     fc.connectTerminals(wiimote_node_['accelY'], buffer_node_y['dataIn'])
     fc.connectTerminals(wiimote_node_['accelZ'], buffer_node_z['dataIn'])
-    fc.connectTerminals(buffer_node_x['dataOut'], filter_node_mean['In'])
-    fc.connectTerminals(buffer_node_y['dataOut'], filter_node_gaussian['In'])
-    fc.connectTerminals(buffer_node_z['dataOut'], filter_node_median['In'])
+    fc.connectTerminals(buffer_node_x['newOut'], filter_node_mean['In'])
+    fc.connectTerminals(buffer_node_y['newOut'], filter_node_gaussian['In'])
+    fc.connectTerminals(buffer_node_z['newOut'], filter_node_median['In'])
     fc.connectTerminals(filter_node_mean['Out'], pw_x_node['In'])
     fc.connectTerminals(filter_node_gaussian['Out'], pw_y_node['In'])
     fc.connectTerminals(filter_node_median['Out'], pw_z_node['In'])
@@ -178,22 +278,47 @@ def main():
     lt.addWidget(nv_pw, 3, 1)
     nv_pw.setXRange(-1, 1)
     nv_pw.setYRange(-1, 1)
-    nv_pc = fc.createNode('PlotCurve', pos=(-100, 150))
-    nv_pw_node = fc.createNode('PlotWidget', pos=(-100, 300))
-
-    nv_pw_node.setPlot(nv_pw)
+    nv_pw_node = setup_node(fc, 'FramePlot', -100, 300, nv_pw)
 
     nvn = fc.createNode('CustomNormalVector', 'CustomNormalVectorNode',
                         pos=(-100, 450))
 
-    fc.connectTerminals(wiimote_node_['accelX'], nvn['x_axis_in'])
-    fc.connectTerminals(wiimote_node_['accelZ'], nvn['z_axis_in'])
-    fc.connectTerminals(nvn['x_rotation_out'], nv_pc['x'])
-    fc.connectTerminals(nvn['z_rotation_out'], nv_pc['y'])
-    fc.connectTerminals(nv_pc['plot'], nv_pw_node['In'])
+    # the whole buffered windows are computed in one call per update
+    fc.connectTerminals(buffer_node_x['dataOut'], nvn['x_axis_in'])
+    fc.connectTerminals(buffer_node_y['dataOut'], nvn['y_axis_in'])
+    fc.connectTerminals(buffer_node_z['dataOut'], nvn['z_axis_in'])
+    fc.connectTerminals(nvn['x_rotation_out'], nv_pw_node['x'])
+    fc.connectTerminals(nvn['z_rotation_out'], nv_pw_node['In'])
 
     # end of optional node implementation
 
+    # live spectrum of the x axis; only the new frames are transformed
+    spectrogram_pw = pg.PlotWidget()
+    lt.addWidget(spectrogram_pw, 2, 0, 2, 1)
+    spectrogram_node = setup_node(fc, 'Spectrogram', 150, 300,
+                                  spectrogram_pw)
+
+    fc.connectTerminals(wiimote_node_['accelX'], spectrogram_node['In'])
+
+    # the samples are processed as they arrive; the plots are drawn on the
+    # frames of the clock
+    frame_clock = analyze_nodes.FrameClock(FPS)
+
+    for node in [pw_x_node, pw_y_node, pw_z_node, nv_pw_node,
+                 spectrogram_node]:
+        frame_clock.register(node)
+
+    fps_label = QtGui.QLabel()
+    lt.addWidget(fps_label, 4, 1)
+    frame_clock.fps_changed.connect(
+        lambda fps: fps_label.setText('%.1f fps (%d frames skipped)' %
+                                      (fps, frame_clock.skipped)))
+
+    # NODE_PROFILE=1 shows the time spent in every node in the flowchart
+    node_profiler.attach_if_requested(fc)
+
+    frame_clock.start()
+
     win.show()
 
     if (sys.flags.interactive != 1) or not hasattr(QtCore, 'PYQT_VERSION'):
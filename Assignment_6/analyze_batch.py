@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# -*- coding: utf-8 -*-
+
+"""
+runs the RingBuffer and filter nodes of analyze.py over recorded
+accelerometer files without a window or a wiimote and reports the throughput
+in samples/s
+
+the files are csv or binary (*.bin) files of Assignment_7's
+trainings_data_logger.py. they are read chunk by chunk and every chunk is
+pushed through a flowchart wired like the filter path of analyze.py: raw
+samples -> RingBuffer -> newOut -> filter. the plots and the normal vector
+node are not part of it. the filters start over at every recording (a_id).
+the filtered samples are written to <name>_filtered.csv in the same column
+layout, so the output can be read like a recording.
+
+usage: ./analyze_batch.py data.csv recordings.bin -o filtered/
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, 'common'))  # shared modules
+import trainings_data as td
+
+CSV_FORMAT = '%d;%.3f;%.3f;%.3f;%.7f'  # the filtered values are floats
+
+
+def parse_args():
+    """
+    parses the command line arguments
+
+    :return: the parsed arguments
+    """
+
+    parser = argparse.ArgumentParser(
+        description='filters recorded accelerometer data with the nodes of '
+                    'analyze.py')
+
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('-o', '--output-dir', default=None,
+                        help='directory of the filtered files; next to the '
+                             'recorded ones by default')
+    parser.add_argument('--chunk-size', type=int, default=4096,
+                        help='samples pushed through the nodes at once')
+
+    return parser.parse_args()
+
+
+def output_file(file, output_dir=None):
+    """
+    :param file: the path of a recorded file
+    :param output_dir: the directory of the filtered file or None
+    :return: the path of the filtered file
+    """
+
+    name = os.path.splitext(os.path.basename(file))[0] + '_filtered.csv'
+
+    return os.path.join(output_dir or os.path.dirname(file), name)
+
+
+class BatchGraph:
+    """
+    flowchart holding the RingBuffer and filter nodes of analyze.py between
+    an input and an output terminal per axis; setInput() processes the nodes
+    synchronously, so no event loop is needed
+    """
+
+    AXES = ['X', 'Y', 'Z']
+
+    def __init__(self):
+        """
+        constructor
+
+        :return: void
+        """
+
+        from pyqtgraph.flowchart import Flowchart
+        import analyze_nodes
+
+        terminals = {}
+
+        for axis in self.AXES:
+            terminals['accel' + axis] = dict(io='in')
+            terminals['filtered' + axis] = dict(io='out')
+
+        self.fc = Flowchart(terminals=terminals)
+        self.buffer_nodes = [self.fc.createNode('RingBuffer', pos=(0, y))
+                             for y in (0, 150, -150)]
+        self.filter_nodes = analyze_nodes.setup_filter_nodes(self.fc)
+
+        for axis, buffer_node, filter_node in zip(self.AXES,
+                                                  self.buffer_nodes,
+                                                  self.filter_nodes):
+            self.fc.connectTerminals(self.fc['accel' + axis],
+                                     buffer_node['dataIn'])
+            self.fc.connectTerminals(buffer_node['newOut'], filter_node['In'])
+            self.fc.connectTerminals(filter_node['Out'],
+                                     self.fc['filtered' + axis])
+
+    def reset(self):
+        """
+        restarts the filters
+
+        :return: void
+        """
+
+        for node in self.filter_nodes:
+            node.reset()
+
+    def process(self, records):
+        """
+        filters the samples of one recording
+
+        :param records: a structured array of trainings_data.RECORD_DTYPE
+        :return: the records with the filtered samples
+        """
+
+        filtered = records.copy()
+
+        # newOut only holds the samples that fit into a buffer, so the
+        # records are pushed in updates of at most that size, like the
+        # small batches the wiimote delivers in analyze.py
+        step = min(node.size for node in self.buffer_nodes)
+
+        for start in range(0, len(records), step):
+            end = start + step
+
+            self.fc.setInput(accelX=records['x'][start:end],
+                             accelY=records['y'][start:end],
+                             accelZ=records['z'][start:end])
+            output = self.fc.output()
+
+            filtered['x'][start:end] = output['filteredX']
+            filtered['y'][start:end] = output['filteredY']
+            filtered['z'][start:end] = output['filteredZ']
+
+        return filtered
+
+
+def process_file(graph, file, output, chunk_size):
+    """
+    filters a recorded file
+
+    :param graph: the BatchGraph
+    :param file: the recorded file
+    :param output: the path of the filtered file
+    :param chunk_size: the maximum amount of samples processed at once
+    :return: the amount of samples and the seconds spent in the nodes
+    """
+
+    samples = 0
+    processing = 0.0
+    a_id = None
+
+    with open(output, 'wb') as outfile:
+        outfile.write((td.CSV_HEADER + '\n').encode())
+
+        for chunk in td.iter_chunks(file, chunk_size):
+            starts = np.flatnonzero(np.diff(chunk['a_id'])) + 1
+
+            for run in np.split(chunk, starts):
+                if run['a_id'][0] != a_id:
+                    graph.reset()
+                    a_id = run['a_id'][0]
+
+                start = time.perf_counter()
+                filtered = graph.process(run)
+                processing += time.perf_counter() - start
+
+                np.savetxt(outfile, filtered, fmt=CSV_FORMAT)
+                samples += len(run)
+
+    return samples, processing
+
+
+def main():
+    """
+    application entry point
+
+    :return: void
+    """
+
+    args = parse_args()
+
+    # the nodes are widgets, which need a QApplication but no display
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    from pyqtgraph.Qt import QtGui
+
+    app = QtGui.QApplication(sys.argv[:1])
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    graph = BatchGraph()
+
+    total_samples = 0
+    total_processing = 0.0
+    start = time.perf_counter()
+
+    print('file;samples;nodes_samples_per_s;total_samples_per_s')
+
+    for file in args.files:
+        output = output_file(file, args.output_dir)
+
+        file_start = time.perf_counter()
+        samples, processing = process_file(graph, file, output,
+                                           args.chunk_size)
+        duration = time.perf_counter() - file_start
+
+        total_samples += samples
+        total_processing += processing
+
+        print('%s;%d;%.0f;%.0f' % (file, samples,
+                                   samples / max(processing, 1e-9),
+                                   samples / max(duration, 1e-9)))
+
+    duration = time.perf_counter() - start
+
+    print('all;%d;%.0f;%.0f' % (total_samples,
+                                total_samples / max(total_processing, 1e-9),
+                                total_samples / max(duration, 1e-9)))
+
+    app.quit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,1212 @@
+from pyqtgraph.flowchart import Node
+from pyqtgraph.flowchart.library.common import CtrlNode
+import pyqtgraph.flowchart.library as fclib
+import pyqtgraph as pg
+from pyqtgraph.Qt import QtCore, QtGui
+import numpy as np
+import heapq
+import math
+import time
+
+"""
+Flowchart nodes for analyze.py. Importing this module registers them.
+"""
+
+
+class RingBufferNode(CtrlNode):
+    """
+    keeps the last 'size' samples in a preallocated circular array
+
+    every sample is written twice, at idx and idx + size, so the last 'size'
+    samples are always one contiguous slice; dataOut is a read-only view of
+    that slice instead of a copy, newOut a view of the samples added by the
+    current update. a tick costs the same no matter how large the buffer is
+    """
+
+    nodeName = "RingBuffer"
+
+    uiTemplate = [
+        ('size', 'spin', {'value': 32, 'step': 1, 'bounds': [1, 1000000],
+                          'int': True})
+    ]
+
+    def __init__(self, node_name):
+        terminals = {
+            'dataIn': dict(io='in'),
+            'dataOut': dict(io='out'),
+            'newOut': dict(io='out')
+        }
+
+        self.size = 0
+        self.buffer = np.zeros(0)
+        self.idx = 0  # the position the next sample is written to
+        self.count = 0  # the amount of valid samples (at most size)
+
+        CtrlNode.__init__(self, node_name, terminals=terminals)
+
+        self.resize(int(self.ctrls['size'].value()))
+
+    def resize(self, size):
+        """
+        reallocates the buffer; keeps the most recent samples
+
+        :param size: the new capacity in samples
+        :return: void
+        """
+
+        kept = self.view()[-size:].copy() if self.count > 0 else np.zeros(0)
+
+        self.size = size
+        self.buffer = np.zeros(2 * size)
+        self.idx = 0
+        self.count = 0
+
+        self.append(kept)
+
+    def append(self, values):
+        """
+        writes samples into the buffer
+
+        :param values: a scalar or an array of samples
+        :return: the amount of written samples
+        """
+
+        values = np.ravel(values)
+        n = len(values)
+
+        if n == 0:
+            return 0
+
+        if n > self.size:
+            values = values[-self.size:]
+            n = self.size
+
+        # at most two contiguous runs: up to the end and from the start
+        first = min(n, self.size - self.idx)
+
+        for offset in (0, self.size):
+            start = self.idx + offset
+            self.buffer[start:start + first] = values[:first]
+            self.buffer[offset:offset + n - first] = values[first:]
+
+        self.idx = (self.idx + n) % self.size
+        self.count = min(self.count + n, self.size)
+
+        return n
+
+    def view(self, n=None):
+        """
+        returns the most recent samples without copying them
+
+        :param n: the amount of samples; all valid ones if None
+        :return: a read-only view ordered from the oldest to the newest
+        """
+
+        n = self.count if n is None else min(n, self.count)
+        end = self.idx + self.size
+
+        view = self.buffer[end - n:end]
+        view.flags.writeable = False
+
+        return view
+
+    def process(self, **kwds):
+        size = int(self.ctrls['size'].value())
+
+        if size != self.size:
+            self.resize(size)
+
+        data_in = kwds['dataIn']
+
+        added = self.append(data_in) if data_in is not None else 0
+
+        return {
+            'dataOut': self.view(),
+            'newOut': self.view(added)
+        }
+
+
+fclib.registerNodeType(RingBufferNode, [('Data',)])
+
+
+"""
+incremental filters; each call takes one sample and returns the filtered one
+"""
+
+
+class RunningMean:
+    """
+    mean of the last n samples kept as a running sum
+    """
+
+    def __init__(self, n):
+        """
+        constructor
+
+        :param n: the window size
+        :return: void
+        """
+
+        self.window = [0.0] * n
+        self.idx = 0
+        self.count = 0
+        self.sum = 0.0
+
+    def __call__(self, value):
+        """
+        :param value: the new sample
+        :return: the mean of the window
+        """
+
+        n = len(self.window)
+
+        if self.count == n:
+            self.sum -= self.window[self.idx]
+        else:
+            self.count += 1
+
+        self.window[self.idx] = value
+        self.sum += value
+        self.idx = (self.idx + 1) % n
+
+        # resumming once per window keeps rounding errors from adding up
+        if self.idx == 0:
+            self.sum = math.fsum(self.window[:self.count])
+
+        return self.sum / self.count
+
+
+class SlidingMedian:
+    """
+    median of the last n samples kept in two heaps: a max heap of the lower
+    and a min heap of the upper half. samples leaving the window are removed
+    lazily once they reach the top of their heap, and the heaps are rebuilt
+    from the window once n removed samples are pending, so a sample costs
+    amortized O(log n) instead of sorting the window
+    """
+
+    def __init__(self, n):
+        """
+        constructor
+
+        :param n: the window size
+        :return: void
+        """
+
+        self.n = n
+        self.window = [0.0] * n
+        self.idx = 0
+        self.count = 0
+
+        self.low = []  # negated values
+        self.high = []
+        self.low_size = 0  # the amount of valid values in low
+        self.high_size = 0
+        self.delayed = {}  # values to remove -> amount
+        self.stale = 0  # the amount of values to remove
+
+    def __prune_(self, heap, sign):
+        """
+        pops the values marked for removal from the top of a heap
+
+        :param heap: low or high
+        :param sign: -1 for low, 1 for high
+        :return: void
+        """
+
+        while heap:
+            value = sign * heap[0]
+            pending = self.delayed.get(value, 0)
+
+            if pending == 0:
+                break
+
+            if pending == 1:
+                del self.delayed[value]
+            else:
+                self.delayed[value] = pending - 1
+
+            heapq.heappop(heap)
+            self.stale -= 1
+
+    def __rebuild_(self):
+        """
+        rebuilds both heaps from the window, which drops all values pending
+        removal, even the ones far from the top
+
+        :return: void
+        """
+
+        values = sorted(self.window[:self.count])
+        half = (len(values) + 1) // 2
+
+        self.low = [-v for v in values[:half]]
+        self.high = values[half:]
+        heapq.heapify(self.low)
+
+        self.low_size = len(self.low)
+        self.high_size = len(self.high)
+        self.delayed = {}
+        self.stale = 0
+
+    def __balance_(self):
+        """
+        keeps low one value larger than high or both the same size
+
+        :return: void
+        """
+
+        if self.low_size > self.high_size + 1:
+            heapq.heappush(self.high, -heapq.heappop(self.low))
+            self.low_size -= 1
+            self.high_size += 1
+            self.__prune_(self.low, -1)
+        elif self.low_size < self.high_size:
+            heapq.heappush(self.low, -heapq.heappop(self.high))
+            self.low_size += 1
+            self.high_size -= 1
+            self.__prune_(self.high, 1)
+
+    def __insert_(self, value):
+        if not self.low or value <= -self.low[0]:
+            heapq.heappush(self.low, -value)
+            self.low_size += 1
+        else:
+            heapq.heappush(self.high, value)
+            self.high_size += 1
+
+        self.__balance_()
+
+    def __erase_(self, value):
+        self.delayed[value] = self.delayed.get(value, 0) + 1
+        self.stale += 1
+
+        if value <= -self.low[0]:
+            self.low_size -= 1
+
+            if value == -self.low[0]:
+                self.__prune_(self.low, -1)
+        else:
+            self.high_size -= 1
+
+            if self.high and value == self.high[0]:
+                self.__prune_(self.high, 1)
+
+        self.__balance_()
+
+    def __call__(self, value):
+        """
+        :param value: the new sample
+        :return: the median of the window
+        """
+
+        value = float(value)
+
+        self.__insert_(value)
+
+        if self.count == self.n:
+            self.__erase_(self.window[self.idx])
+        else:
+            self.count += 1
+
+        self.window[self.idx] = value
+        self.idx = (self.idx + 1) % self.n
+
+        if self.stale > self.n:
+            self.__rebuild_()
+
+        if self.low_size > self.high_size:
+            return -self.low[0]
+
+        return (-self.low[0] + self.high[0]) / 2
+
+
+class RecursiveGaussian:
+    """
+    causal recursive approximation of a gaussian filter (Young and van
+    Vliet, 1995): a third order IIR filter whose cost per sample does not
+    depend on sigma. being causal, it delays the signal by about sigma
+    samples
+    """
+
+    def __init__(self, sigma):
+        """
+        constructor
+
+        :param sigma: the standard deviation in samples (at least 0.5)
+        :return: void
+        """
+
+        if sigma >= 2.5:
+            q = 0.98711 * sigma - 0.96330
+        else:
+            q = 3.97156 - 4.14554 * math.sqrt(1 - 0.26891 * sigma)
+
+        b0 = 1.57825 + 2.44413 * q + 1.4281 * q ** 2 + 0.422205 * q ** 3
+        b1 = 2.44413 * q + 2.85619 * q ** 2 + 1.26661 * q ** 3
+        b2 = -(1.4281 * q ** 2 + 1.26661 * q ** 3)
+        b3 = 0.422205 * q ** 3
+
+        self.b = (b1 / b0, b2 / b0, b3 / b0)
+        self.gain = 1 - (b1 + b2 + b3) / b0
+
+        self.y = None  # the last three outputs
+
+    def __call__(self, value):
+        """
+        :param value: the new sample
+        :return: the filtered sample
+        """
+
+        if self.y is None:
+            # starts settled at the first value instead of rising from 0
+            self.y = (value, value, value)
+
+        y = self.gain * value + self.b[0] * self.y[0] + \
+            self.b[1] * self.y[1] + self.b[2] * self.y[2]
+
+        self.y = (y, self.y[0], self.y[1])
+
+        return y
+
+
+class IncrementalFilterNode(CtrlNode):
+    """
+    base class of the nodes filtering the new samples of each update, e.g.
+    the wiimote's values or a RingBuffer's newOut; Out holds the filtered
+    new samples, so a RingBuffer behind the filter keeps the history
+    """
+
+    param = None  # the name of the control configuring the filter
+
+    def __init__(self, node_name):
+        self.filter = None
+        self.setting = None
+
+        CtrlNode.__init__(self, node_name)
+
+    def create_filter(self, setting):
+        raise NotImplementedError
+
+    def reset(self):
+        """
+        forgets the samples filtered so far, e.g. at the start of another
+        recording
+
+        :return: void
+        """
+
+        self.filter = None
+        self.setting = None
+
+    def process(self, In, display=True):
+        setting = self.ctrls[self.param].value()
+
+        if setting != self.setting:
+            self.filter = self.create_filter(setting)
+            self.setting = setting
+
+        if In is None:
+            return {'Out': None}
+
+        values = np.ravel(In)
+        out = np.empty(len(values))
+
+        for i in range(len(values)):
+            out[i] = self.filter(values[i])
+
+        return {'Out': out}
+
+
+class RunningMeanFilterNode(IncrementalFilterNode):
+    """
+    sliding mean; O(1) per sample
+    """
+
+    nodeName = "RunningMeanFilter"
+
+    uiTemplate = [
+        ('n', 'intSpin', {'value': 5, 'min': 1, 'max': 1000000})
+    ]
+
+    param = 'n'
+
+    def create_filter(self, setting):
+        return RunningMean(setting)
+
+
+class SlidingMedianFilterNode(IncrementalFilterNode):
+    """
+    sliding median; O(log n) per sample
+    """
+
+    nodeName = "SlidingMedianFilter"
+
+    uiTemplate = [
+        ('n', 'intSpin', {'value': 5, 'min': 1, 'max': 1000000})
+    ]
+
+    param = 'n'
+
+    def create_filter(self, setting):
+        return SlidingMedian(setting)
+
+
+class RecursiveGaussianFilterNode(IncrementalFilterNode):
+    """
+    recursive gaussian; O(1) per sample
+    """
+
+    nodeName = "RecursiveGaussianFilter"
+
+    uiTemplate = [
+        ('sigma', 'doubleSpin', {'value': 2.0, 'min': 0.5, 'max': 1000000})
+    ]
+
+    param = 'sigma'
+
+    def create_filter(self, setting):
+        return RecursiveGaussian(setting)
+
+
+fclib.registerNodeType(RunningMeanFilterNode, [('Filters',)])
+fclib.registerNodeType(SlidingMedianFilterNode, [('Filters',)])
+fclib.registerNodeType(RecursiveGaussianFilterNode, [('Filters',)])
+
+
+def setup_filter_nodes(fc):
+    """
+    creates the filter nodes of the accelerometer axes; analyze.py and
+    analyze_batch.py share them, so this module must not import wiimote
+
+    :param fc: the flowchart receiving the nodes
+    :return: the filter nodes of the x, y and z axis
+    """
+
+    return (fc.createNode('RunningMeanFilter', pos=(0, -300)),
+            fc.createNode('RecursiveGaussianFilter', pos=(150, -300)),
+            fc.createNode('SlidingMedianFilter', pos=(300, -300)))
+
+
+class FrameClock(QtCore.QObject):
+    """
+    renders registered nodes on a fixed frame rate instead of on every
+    sample; nodes only render if new data arrived since their last frame,
+    and ticks the event loop could not serve in time are skipped instead of
+    being queued up
+    """
+
+    fps_changed = QtCore.pyqtSignal(float)  # achieved frames per second
+
+    def __init__(self, fps=30):
+        """
+        constructor
+
+        :param fps: the target frame rate
+        :return: void
+        """
+
+        super(FrameClock, self).__init__()
+
+        self.period = 1.0 / fps
+        self.renderables = []
+
+        self.frames = 0
+        self.skipped = 0
+        self.fps = 0.0
+
+        self.last_tick = None
+        self.measure_start = None
+        self.measure_frames = 0
+
+        self.timer = QtCore.QTimer()
+        self.timer.setTimerType(QtCore.Qt.PreciseTimer)
+        self.timer.timeout.connect(self.tick)
+
+    def register(self, renderable):
+        """
+        :param renderable: an object with a render() method returning True
+                           if it drew something
+        :return: void
+        """
+
+        self.renderables.append(renderable)
+
+    def start(self):
+        self.timer.start(int(round(self.period * 1000)))
+
+    def stop(self):
+        self.timer.stop()
+
+    def tick(self):
+        """
+        renders one frame; called by the timer
+
+        :return: void
+        """
+
+        now = time.monotonic()
+
+        if self.last_tick is not None:
+            # the ticks lost while the event loop was busy
+            self.skipped += max(0, int((now - self.last_tick) /
+                                       self.period) - 1)
+        else:
+            self.measure_start = now
+
+        self.last_tick = now
+
+        drawn = False
+
+        for renderable in self.renderables:
+            drawn = renderable.render() or drawn
+
+        if drawn:
+            self.frames += 1
+            self.measure_frames += 1
+
+        if now - self.measure_start >= 1.0:
+            self.fps = self.measure_frames / (now - self.measure_start)
+            self.measure_start = now
+            self.measure_frames = 0
+            self.fps_changed.emit(self.fps)
+
+
+class FramePlotNode(Node):
+    """
+    plot node drawing on the frames of a FrameClock: process() only keeps
+    the latest input, render() copies it into one persistent curve
+    """
+
+    nodeName = "FramePlot"
+
+    def __init__(self, node_name):
+        terminals = {
+            'In': dict(io='in'),
+            'x': dict(io='in')
+        }
+
+        self.plot = None
+        self.curve = None
+        self.data = None
+        self.x = None
+        self.is_dirty = False
+
+        Node.__init__(self, node_name, terminals=terminals)
+
+    def setPlot(self, plot):
+        """
+        :param plot: the PlotWidget to draw on
+        :return: void
+        """
+
+        if self.curve is not None:
+            self.plot.removeItem(self.curve)
+
+        self.plot = plot
+        self.curve = plot.plot()
+        self.is_dirty = self.data is not None
+
+    def process(self, In, x=None, display=True):
+        self.data = In
+        self.x = x
+        self.is_dirty = True
+
+        return {}
+
+    def render(self):
+        """
+        draws the latest input if it changed since the last frame
+
+        :return: True if the curve was updated
+        """
+
+        if not self.is_dirty or self.curve is None or self.data is None:
+            return False
+
+        self.is_dirty = False
+
+        # the input may be a view into a buffer that keeps changing
+        y = np.array(self.data, dtype=float, ndmin=1)
+
+        if self.x is None:
+            self.curve.setData(y)
+        else:
+            self.curve.setData(np.array(self.x, dtype=float, ndmin=1), y)
+
+        return True
+
+
+fclib.registerNodeType(FramePlotNode, [('Display',)])
+
+
+class MinMaxPyramid:
+    """
+    history of samples with a min/max downsampling pyramid built while the
+    samples arrive
+
+    level 0 keeps the raw samples in a circular array, every level above
+    the minimum and maximum of blocks of 'factor' entries of the level
+    below; all levels cover the last 'capacity' samples. a new sample
+    touches the levels above only once a block is complete, so appending
+    costs amortized O(1), and fetch() reads the coarsest level that still
+    has as many points as asked for, so its cost depends on the amount of
+    points only and not on the length of the history
+    """
+
+    def __init__(self, capacity, factor=4):
+        """
+        constructor
+
+        :param capacity: the amount of samples kept
+        :param factor: the amount of entries of a level combined into one
+                       of the next level
+        :return: void
+        """
+
+        self.capacity = capacity
+        self.factor = factor
+
+        self.lows = []
+        self.highs = []
+        self.committed = []  # the amount of blocks ever written per level
+
+        # the block in progress on every level but 0: min, max and the
+        # amount of entries of the level below it contains
+        self.open_lows = []
+        self.open_highs = []
+        self.open_counts = []
+
+        block = 1
+
+        while True:
+            size = capacity // block + 2
+            self.lows.append(np.zeros(size))
+            # level 0 stores raw samples, so its min and max are the same
+            self.highs.append(self.lows[0] if block == 1 else
+                              np.zeros(size))
+            self.committed.append(0)
+            self.open_lows.append(math.inf)
+            self.open_highs.append(-math.inf)
+            self.open_counts.append(0)
+
+            if block >= capacity:
+                break
+
+            block *= factor
+
+    @property
+    def total(self):
+        """
+        :return: the amount of samples ever appended
+        """
+
+        return self.committed[0]
+
+    def append(self, values):
+        """
+        adds samples and updates the levels above
+
+        :param values: a scalar or an array of samples
+        :return: void
+        """
+
+        lows = highs = np.ravel(np.asarray(values, dtype=float))
+
+        for level in range(len(self.lows)):
+            if len(lows) == 0:
+                return
+
+            if level > 0:
+                lows, highs = self.__combine_(level, lows, highs)
+
+            self.__write_(level, lows, highs)
+
+    def __combine_(self, level, lows, highs):
+        """
+        adds entries of the level below to the blocks of a level
+
+        :param level: the level
+        :param lows: the minimums of the new entries of the level below
+        :param highs: the maximums of the new entries of the level below
+        :return: the minimums and maximums of the completed blocks
+        """
+
+        f = self.factor
+        done_lows = []
+        done_highs = []
+
+        # fill up the block in progress first
+        take = min(len(lows), f - self.open_counts[level])
+
+        if take > 0:
+            self.open_lows[level] = min(self.open_lows[level],
+                                        lows[:take].min())
+            self.open_highs[level] = max(self.open_highs[level],
+                                         highs[:take].max())
+            self.open_counts[level] += take
+
+        if self.open_counts[level] == f:
+            done_lows.append([self.open_lows[level]])
+            done_highs.append([self.open_highs[level]])
+            self.__reset_open_(level)
+
+        lows = lows[take:]
+        highs = highs[take:]
+
+        # then complete blocks at once
+        full = len(lows) // f * f
+
+        if full > 0:
+            done_lows.append(lows[:full].reshape(-1, f).min(axis=1))
+            done_highs.append(highs[:full].reshape(-1, f).max(axis=1))
+
+        if full < len(lows):
+            self.open_lows[level] = lows[full:].min()
+            self.open_highs[level] = highs[full:].max()
+            self.open_counts[level] = len(lows) - full
+
+        if len(done_lows) == 0:
+            return np.zeros(0), np.zeros(0)
+
+        return np.concatenate(done_lows), np.concatenate(done_highs)
+
+    def __reset_open_(self, level):
+        self.open_lows[level] = math.inf
+        self.open_highs[level] = -math.inf
+        self.open_counts[level] = 0
+
+    def __write_(self, level, lows, highs):
+        """
+        writes completed blocks into the circular arrays of a level
+
+        :param level: the level
+        :param lows: the minimums of the blocks
+        :param highs: the maximums of the blocks
+        :return: void
+        """
+
+        size = len(self.lows[level])
+        n = len(lows)
+        idx = np.arange(self.committed[level] + max(0, n - size),
+                        self.committed[level] + n) % size
+
+        self.lows[level][idx] = lows[-size:]
+
+        if level > 0:
+            self.highs[level][idx] = highs[-size:]
+
+        self.committed[level] += n
+
+    def __open_block_(self, level):
+        """
+        :param level: a level above 0
+        :return: the minimum and maximum of the samples of the block in
+                 progress of a level; they are spread over the blocks in
+                 progress of all levels up to it
+        """
+
+        low = min(self.open_lows[1:level + 1])
+        high = max(self.open_highs[1:level + 1])
+
+        return low, high
+
+    def fetch(self, start, end, max_points):
+        """
+        returns the samples of a range at a resolution of at most max_points
+        points; above level 0 every block contributes its minimum and its
+        maximum, so peaks stay visible at every zoom
+
+        :param start: the index of the first sample
+        :param end: the index after the last sample
+        :param max_points: the maximum amount of points returned
+        :return: the sample indices and values of the points as arrays
+        """
+
+        start = max(int(start), self.total - self.capacity, 0)
+        end = min(int(end), self.total)
+
+        if end <= start:
+            return np.zeros(0), np.zeros(0)
+
+        block = 1
+
+        for level in range(len(self.lows)):
+            first = start // block
+            last = (end - 1) // block
+            points = last - first + 1
+
+            if level > 0:
+                points *= 2
+
+            if points <= max_points or level == len(self.lows) - 1:
+                break
+
+            block *= self.factor
+
+        if level == 0:
+            x = np.arange(start, end)
+            return x, self.lows[0][x % len(self.lows[0])]
+
+        committed = min(last, self.committed[level] - 1)
+        blocks = np.arange(first, committed + 1)
+        idx = blocks % len(self.lows[level])
+        lows = self.lows[level][idx]
+        highs = self.highs[level][idx]
+
+        if last > committed:
+            low, high = self.__open_block_(level)
+            blocks = np.append(blocks, last)
+            lows = np.append(lows, low)
+            highs = np.append(highs, high)
+
+        # both points of a block at its center draw a vertical line
+        x = np.repeat(blocks * block + (block - 1) / 2.0, 2)
+        y = np.empty(2 * len(blocks))
+        y[0::2] = lows
+        y[1::2] = highs
+
+        return x, y
+
+
+class HistoryPlotNode(CtrlNode):
+    """
+    plot node for long histories drawing on the frames of a FrameClock:
+    process() appends the new samples to a MinMaxPyramid, render() fetches
+    one min/max pair per pixel column of the visible range, so a frame
+    costs the same for any history length and zoom
+
+    the x axis is the sample index; while 'follow' is checked the plot
+    shows the last 'span' samples, otherwise the range zoomed or panned to
+    """
+
+    nodeName = "HistoryPlot"
+
+    uiTemplate = [
+        ('history', 'intSpin', {'value': 60000, 'min': 100,
+                                'max': 100000000}),
+        ('span', 'intSpin', {'value': 1000, 'min': 2, 'max': 100000000}),
+        ('follow', 'check', {'checked': True})
+    ]
+
+    def __init__(self, node_name):
+        terminals = {
+            'In': dict(io='in')
+        }
+
+        self.plot = None
+        self.curve = None
+        self.pyramid = None
+        self.is_dirty = False
+
+        CtrlNode.__init__(self, node_name, terminals=terminals)
+
+        self.pyramid = MinMaxPyramid(int(self.ctrls['history'].value()))
+
+    def setPlot(self, plot):
+        """
+        :param plot: the PlotWidget to draw on
+        :return: void
+        """
+
+        if self.curve is not None:
+            self.plot.removeItem(self.curve)
+            self.plot.getViewBox().sigXRangeChanged.disconnect(
+                self.on_range_changed)
+
+        self.plot = plot
+        self.curve = plot.plot()
+        plot.getViewBox().sigXRangeChanged.connect(self.on_range_changed)
+        self.is_dirty = True
+
+    def on_range_changed(self, *args):
+        # zooming and panning need other points than the ones drawn
+        if not self.ctrls['follow'].isChecked():
+            self.is_dirty = True
+
+    def process(self, In, display=True):
+        history = int(self.ctrls['history'].value())
+
+        if history != self.pyramid.capacity:
+            self.pyramid = MinMaxPyramid(history)
+
+        if In is not None:
+            self.pyramid.append(In)
+            self.is_dirty = True
+
+        return {}
+
+    def render(self):
+        """
+        draws the visible range if the samples or the range changed since
+        the last frame
+
+        :return: True if the curve was updated
+        """
+
+        if not self.is_dirty or self.curve is None or \
+                self.pyramid.total == 0:
+            return False
+
+        self.is_dirty = False
+
+        view_box = self.plot.getViewBox()
+
+        if self.ctrls['follow'].isChecked():
+            end = self.pyramid.total
+            start = end - int(self.ctrls['span'].value())
+            view_box.setXRange(start, end, padding=0)
+        else:
+            x_range = view_box.viewRange()[0]
+            start = int(math.floor(x_range[0]))
+            end = int(math.ceil(x_range[1])) + 1
+
+        # one min/max pair per pixel column
+        pixels = max(int(view_box.width()), 1)
+
+        x, y = self.pyramid.fetch(start, end, 2 * pixels)
+        self.curve.setData(x, y)
+
+        return True
+
+
+fclib.registerNodeType(HistoryPlotNode, [('Display',)])
+
+
+class SpectrogramNode(CtrlNode):
+    """
+    short-time fourier transform of the incoming samples drawn as a
+    scrolling image on the frames of a FrameClock
+
+    the hann window is computed once per window size; process() only
+    transforms the frames completed by the new samples, all of them in one
+    rfft call, and keeps the samples of the next, unfinished frame. the
+    columns are written twice into a circular array, like in RingBuffer,
+    so the last 'columns' frames are always one contiguous slice for the
+    image. frame means are removed first, so the accelerometer's offset
+    does not drown the spectrum in bin 0
+    """
+
+    nodeName = "Spectrogram"
+
+    uiTemplate = [
+        ('window', 'intSpin', {'value': 64, 'min': 4, 'max': 65536}),
+        ('hop', 'intSpin', {'value': 8, 'min': 1, 'max': 65536}),
+        ('columns', 'intSpin', {'value': 200, 'min': 2, 'max': 100000}),
+        ('rate', 'doubleSpin', {'value': 100.0, 'min': 1.0, 'max': 100000}),
+        ('floor', 'doubleSpin', {'value': 0.0, 'min': -200, 'max': 200}),
+        ('ceiling', 'doubleSpin', {'value': 70.0, 'min': -200, 'max': 200})
+    ]
+
+    def __init__(self, node_name):
+        terminals = {
+            'In': dict(io='in'),
+            'Out': dict(io='out')
+        }
+
+        self.plot = None
+        self.image = None
+        self.is_dirty = False
+
+        self.settings = None
+        self.rate = None
+        self.window = None
+        self.hop = 0
+        self.columns = 0
+
+        self.pending = np.zeros(0)  # the samples of unfinished frames
+        self.pending_count = 0
+        self.skip = 0  # samples before the next frame if hop > window
+
+        self.buffer = np.zeros((0, 0))
+        self.idx = 0  # the position the next column is written to
+        self.count = 0
+
+        CtrlNode.__init__(self, node_name, terminals=terminals)
+
+        self.configure()
+
+    def configure(self):
+        """
+        (re)allocates the window and the buffers if the controls changed;
+        the samples and columns collected so far are dropped then
+
+        :return: void
+        """
+
+        settings = tuple(int(self.ctrls[name].value())
+                         for name in ['window', 'hop', 'columns'])
+
+        if settings == self.settings:
+            if self.image is not None and \
+                    self.ctrls['rate'].value() != self.rate:
+                self.scale_image()
+
+            return
+
+        self.settings = settings
+        size, self.hop, self.columns = settings
+
+        self.window = np.hanning(size)
+
+        self.pending = np.zeros(2 * size)
+        self.pending_count = 0
+        self.skip = 0
+
+        self.buffer = np.zeros((2 * self.columns, size // 2 + 1))
+        self.idx = 0
+        self.count = 0
+
+        if self.image is not None:
+            self.scale_image()
+
+    def setPlot(self, plot):
+        """
+        :param plot: the PlotWidget to draw on
+        :return: void
+        """
+
+        if self.image is not None:
+            self.plot.removeItem(self.image)
+
+        self.plot = plot
+        self.image = pg.ImageItem()
+        plot.addItem(self.image)
+        plot.setLabel('left', 'frequency', units='Hz')
+        self.scale_image()
+
+        self.is_dirty = self.count > 0
+
+    def scale_image(self):
+        """
+        maps the rows of the image to Hz; a column is a frame
+
+        :return: void
+        """
+
+        self.rate = self.ctrls['rate'].value()
+
+        transform = QtGui.QTransform()
+        transform.scale(1, self.rate / len(self.window))
+        self.image.setTransform(transform)
+
+    def append(self, values):
+        """
+        adds samples and transforms the frames they complete
+
+        :param values: a scalar or an array of samples
+        :return: the magnitudes of the new frames in dB, one row per frame
+        """
+
+        values = np.ravel(values)
+
+        if self.skip > 0:
+            skipped = min(self.skip, len(values))
+            values = values[skipped:]
+            self.skip -= skipped
+
+        size = len(self.window)
+        end = self.pending_count + len(values)
+
+        if end > len(self.pending):
+            grown = np.zeros(max(end, 2 * len(self.pending)))
+            grown[:self.pending_count] = self.pending[:self.pending_count]
+            self.pending = grown
+
+        self.pending[self.pending_count:end] = values
+        self.pending_count = end
+
+        if end < size:
+            return np.zeros((0, len(self.window) // 2 + 1))
+
+        n = (end - size) // self.hop + 1
+
+        frames = np.lib.stride_tricks.as_strided(
+            self.pending, shape=(n, size),
+            strides=(self.hop * self.pending.strides[0],
+                     self.pending.strides[0]))
+        frames = frames - frames.mean(axis=1)[:, np.newaxis]
+        frames *= self.window
+
+        magnitudes = np.abs(np.fft.rfft(frames, axis=1))
+        np.maximum(magnitudes, 1e-9, out=magnitudes)
+        spectra = 20 * np.log10(magnitudes)
+
+        # keep the samples the next frame starts with; with a hop larger
+        # than the window the next frame starts after samples not yet read
+        consumed = n * self.hop
+        rest = max(0, end - consumed)
+        self.skip = max(0, consumed - end)
+        self.pending[:rest] = self.pending[consumed:consumed + rest]
+        self.pending_count = rest
+
+        self.write(spectra)
+
+        return spectra
+
+    def write(self, spectra):
+        """
+        writes columns into the circular image buffer
+
+        :param spectra: the magnitudes of the frames, one row per frame
+        :return: void
+        """
+
+        spectra = spectra[-self.columns:]
+        n = len(spectra)
+        first = min(n, self.columns - self.idx)
+
+        for offset in (0, self.columns):
+            start = self.idx + offset
+            self.buffer[start:start + first] = spectra[:first]
+            self.buffer[offset:offset + n - first] = spectra[first:]
+
+        self.idx = (self.idx + n) % self.columns
+        self.count = min(self.count + n, self.columns)
+
+    def view(self):
+        """
+        :return: a read-only view of the last columns ordered from the
+                 oldest to the newest
+        """
+
+        end = self.idx + self.columns
+
+        view = self.buffer[end - self.count:end]
+        view.flags.writeable = False
+
+        return view
+
+    def process(self, In, display=True):
+        self.configure()
+
+        if In is None:
+            return {'Out': None}
+
+        spectra = self.append(In)
+
+        if len(spectra) > 0:
+            self.is_dirty = True
+
+        return {'Out': spectra}
+
+    def render(self):
+        """
+        draws the columns if new frames arrived since the last frame
+
+        :return: True if the image was updated
+        """
+
+        if not self.is_dirty or self.image is None or self.count == 0:
+            return False
+
+        self.is_dirty = False
+
+        self.image.setImage(self.view(), autoLevels=False,
+                            levels=(self.ctrls['floor'].value(),
+                                    self.ctrls['ceiling'].value()))
+
+        return True
+
+
+fclib.registerNodeType(SpectrogramNode, [('Display',)])
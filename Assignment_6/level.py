@@ -1,29 +1,220 @@
 #!/usr/bin/env python3
 # coding: utf-8
 
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, 'common'))  # shared modules
+import wiimote_sim
+wiimote_sim.install_if_requested()  # WIIMOTE_SIM=<signal> simulates it
 import wiimote
+import argparse
+import json
 import time
-import sys
+import numpy as np
+import wiimote_events as we
+import wiimote_output as wo
+import telemetry as tm
 
 WM_ADDRESS = "18:2A:7B:F3:F8:F5"  # default address
 
+CALIBRATION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                'level_calibration.json')
+
+# determined through testing, used until a calibration is saved
+MIN_VALUE = 410
+LEVEL_VALUE = 512
+MAX_VALUE = 610
+
+ACCELEROMETER_RANGE = 1024  # 10 bit accelerometer values
+
+"""
+smoothing stages
+"""
+
+EMA = 'ema'
+MEDIAN = 'median'
+NONE = 'none'
+
+"""
+LED states from one side to the other: (amount of LEDs, side)
+"""
+
+STATES = [
+    (1, False),                                              # *---
+    (2, False),                                              # **--
+    (3, False),                                              # ***-
+    (4, False),                                              # ****
+    (3, True),                                               # -***
+    (2, True),                                               # --**
+    (1, True)                                                # ---*
+]
+
+
+class EMAFilter:
+    """
+    exponential moving average of the accelerometer values
+    """
+
+    def __init__(self, alpha=0.5):
+        """
+        constructor
+
+        :param alpha: the weight of a new value (1 disables the smoothing)
+        :return: void
+        """
+
+        self.alpha = alpha
+        self.value = None
+
+    def __call__(self, values):
+        """
+        :param values: the accelerometer values [x, y, z]
+        :return: the smoothed values as numpy array
+        """
+
+        values = np.asarray(values, dtype=float)
+
+        if self.value is None:
+            self.value = values
+        else:
+            self.value = self.value + self.alpha * (values - self.value)
+
+        return self.value
+
+
+class MedianFilter:
+    """
+    median of the last accelerometer values kept in a small ring buffer;
+    removes single outliers completely
+    """
+
+    def __init__(self, size=5):
+        """
+        constructor
+
+        :param size: the amount of values the median is taken of
+        :return: void
+        """
+
+        self.buffer = np.zeros((size, 3))
+        self.idx = 0
+        self.count = 0
+
+    def __call__(self, values):
+        """
+        :param values: the accelerometer values [x, y, z]
+        :return: the smoothed values as numpy array
+        """
+
+        self.buffer[self.idx] = values
+        self.idx = (self.idx + 1) % len(self.buffer)
+        self.count = min(self.count + 1, len(self.buffer))
+
+        return np.median(self.buffer[:self.count], axis=0)
+
+
+def create_filter(smoothing, size=5, alpha=0.5):
+    """
+    creates a smoothing stage
+
+    :param smoothing: EMA, MEDIAN or NONE
+    :param size: the window size of MEDIAN
+    :param alpha: the weight of a new value of EMA
+    :return: a callable smoothing accelerometer values
+    """
+
+    if smoothing == EMA:
+        return EMAFilter(alpha)
+    if smoothing == MEDIAN:
+        return MedianFilter(size)
+    if smoothing == NONE:
+        return lambda values: np.asarray(values, dtype=float)
+
+    raise Exception("Unknown smoothing '" + smoothing + "'!")
+
+
+def load_calibration(file=CALIBRATION_FILE):
+    """
+    reads a saved calibration
+
+    :param file: the json file written by save_calibration
+    :return: a dict containing min_value, level_value and max_value; the
+             defaults if the file does not exist
+    """
+
+    if not os.path.exists(file):
+        return {'min_value': MIN_VALUE, 'level_value': LEVEL_VALUE,
+                'max_value': MAX_VALUE}
+
+    with open(file, 'r') as calibration_file:
+        return json.load(calibration_file)
+
+
+def save_calibration(calibration, file=CALIBRATION_FILE):
+    """
+    writes a calibration
+
+    :param calibration: a dict containing min_value, level_value and
+                        max_value
+    :param file: the json file
+    :return: void
+    """
+
+    with open(file, 'w') as calibration_file:
+        json.dump(calibration, calibration_file, indent=4)
+
 
 class BubbleLevel:
-    def __init__(self, mac_address=WM_ADDRESS):
+    def __init__(self, mac_address=WM_ADDRESS, smoothing=EMA, hysteresis=5,
+                 calibration_file=CALIBRATION_FILE, status_interval=1.0):
         """
         constructor
 
         :param mac_address: the mac address of the wiimote device
-        :param name: the name of the wiimote device
+        :param smoothing: the smoothing stage: EMA, MEDIAN or NONE
+        :param hysteresis: how far in accelerometer units a value has to be
+                           inside the band of another LED state before the
+                           state changes
+        :param calibration_file: the json file the calibration is read from
+                                 and saved to
+        :param status_interval: the minimum time in seconds between two
+                                status lines of level(); 0 disables them
         :return: void
         """
 
         self.wm = wiimote.connect(mac_address)
+        self.events = we.WiimoteEvents(self.wm)
+        self.output = wo.WiimoteOutput(self.wm)
 
-        # determined through testing, might need manual adjustment
-        self.min_value = 410
-        self.level_value = 512
-        self.max_value = 610
+        self.telemetry = tm.Telemetry(status_interval)
+        self.telemetry.add_source(self.output.stats)
+
+        self.filter = create_filter(smoothing)
+        self.hysteresis = hysteresis
+        self.calibration_file = calibration_file
+
+        calibration = load_calibration(calibration_file)
+
+        self.min_value = calibration['min_value']
+        self.level_value = calibration['level_value']
+        self.max_value = calibration['max_value']
+
+        self.update_intervals()
+
+        self.state = None
+        self.has_rumbled = False
+        self.axis_idx = 0  # default x; x = 0; y = 1
+
+        self.events.subscribe_buttons(self.control)
+
+    def update_intervals(self):
+        """
+        computes the band borders from min_value, level_value and max_value
+        and precomputes the LED state of every accelerometer value
+
+        :return: void
+        """
 
         interval_step = (self.level_value - self.min_value) / 3
 
@@ -36,70 +227,68 @@ class BubbleLevel:
             self.max_value - interval_step
         ]
 
-        self.has_rumbled = False
-        self.has_button_press = True
-        self.axis_idx = 0  # default x; x = 0; y = 1
+        # the level band includes both of its borders
+        values = np.arange(ACCELEROMETER_RANGE)
+        self.lut = np.searchsorted(self.interval, values, side='right')
+        self.lut[values == self.interval[3]] = 3
+
+        self.patterns = [self.led_row(num, side) for num, side in STATES]
 
-    def level_degree(self, value):
+    def level_state(self, value):
         """
-        calculates the amount of LEDs to activate and from which side
+        looks up the LED state of a value; the current state is kept until
+        the value is at least self.hysteresis inside the band of another one
 
-        :param value: the measured value
-        :return: the amount of LEDs to activate,
-                a bool depicting from which side
+        :param value: the filtered value
+        :return: the index of the state in STATES
         """
 
-        if value < self.interval[0]:
-            return 1, False                                  # *---
-        elif self.interval[0] <= value < self.interval[1]:
-            return 2, False                                  # **--
-        elif self.interval[1] <= value < self.interval[2]:
-            return 3, False                                  # ***-
-        elif self.interval[2] <= value <= self.interval[3]:
-            return 4, False                                  # ****
-        elif self.interval[3] < value < self.interval[4]:
-            return 3, True                                   # -***
-        elif self.interval[4] <= value < self.interval[5]:
-            return 2, True                                   # --**
-        elif self.interval[5] <= value:
-            return 1, True                                   # ---*
+        last = ACCELEROMETER_RANGE - 1
+        idx = int(min(max(round(value), 0), last))
+        state = self.lut[idx]
 
-    def control(self):
+        if self.state is not None and state != self.state:
+            lower = self.lut[max(idx - self.hysteresis, 0)]
+            upper = self.lut[min(idx + self.hysteresis, last)]
+
+            if lower != state or upper != state:
+                state = self.state
+
+        self.state = state
+
+        return state
+
+    def control(self, button, is_pressed, timestamp):
         """
-        handles D-Pad input by the user
+        handles D-Pad input by the user; called for every button change
+
+        :param button: the name of the changed button
+        :param is_pressed: whether the button was pressed or released
+        :param timestamp: the time of the change
         :return: void
         """
 
-        if self.wm.buttons["Down"] or self.wm.buttons["Up"] or \
-           self.wm.buttons["Left"] or self.wm.buttons["Right"]:
-            if not self.has_button_press:
-                self.has_button_press = True
-
-                if self.axis_idx == 0:
-                    self.axis_idx = 1
-                else:
-                    self.axis_idx = 0
-        else:
-            self.has_button_press = False
+        if is_pressed and button in ["Down", "Up", "Left", "Right"]:
+            if self.axis_idx == 0:
+                self.axis_idx = 1
+            else:
+                self.axis_idx = 0
 
     def handle_rumble(self, num_leds):
         """
-        handle the rumble and set sleep time based on rumble occurrence
+        rumbles once when the level is reached; the rumble runs in the
+        background, so the updates continue meanwhile
 
         :param num_leds: the amount of LEDs active
-        :return: the time the thread has to sleep (0.05 after no rumble;
-                 0.15 after a rumble)
+        :return: void
         """
 
         if num_leds == 4 and not self.has_rumbled:
-            self.wm.rumble(0.1)
+            self.output.rumble(0.1)
             self.has_rumbled = True
-            return 0.15
         if num_leds != 4 and self.has_rumbled:
             self.has_rumbled = False
 
-        return 0.05
-
     def level(self):
         """
         update loop of leveling operation
@@ -107,25 +296,111 @@ class BubbleLevel:
         :return: void
         """
 
+        # the mean of every 5 reports: 20 Hz at the wiimote's 100 Hz
+        reports = self.events.queue(decimation=5, average=True, maxlen=1)
+        self.telemetry.add_source(lambda: {'dropped': reports.dropped})
+
+        last_iteration = None
+
         while True:
-            print("active axis [" + str(self.axis_idx) + "]; value = " +
-                  str(self.wm.accelerometer[self.axis_idx]))
+            report = reports.get()
 
-            self.control()
+            start = time.time()
+            # from the arrival of the last averaged report until now
+            self.telemetry.record('report_age', start - report[3])
 
-            leds, side = self.level_degree(self.wm.accelerometer[self.axis_idx])
+            value = self.step(report)
 
-            self.activate_led_row(leds, side)
+            end = time.time()
+            self.telemetry.record('step', end - start)
 
-            time.sleep(self.handle_rumble(leds))
+            if last_iteration is not None:
+                self.telemetry.record('loop', end - last_iteration)
+
+            last_iteration = end
+
+            self.telemetry.count('iterations')
+            self.telemetry.status(lambda: "active axis [" +
+                                  str(self.axis_idx) + "]; value = " +
+                                  "%.1f" % value)
+
+    def step(self, report):
+        """
+        updates the LEDs and the rumble with an accelerometer report
 
-    def activate_led_row(self, num, side):
+        :param report: the report (x, y, z, ...)
+        :return: the filtered value of the active axis
         """
-        activates the given amount of LEDs on the given side
+
+        value = self.filter(report[:3])[self.axis_idx]
+        state = self.level_state(value)
+
+        start = time.time()
+
+        if self.output.set_leds(self.patterns[state]):
+            self.telemetry.record('led_write', time.time() - start)
+
+        self.handle_rumble(STATES[state][0])
+
+        return value
+
+    def calibrate(self, duration=10.0):
+        """
+        derives min_value and max_value from the extremes the wiimote is
+        tilted to and saves them; level_value is the middle of both
+
+        :param duration: the time in seconds to record the tilting
+        :return: void
+        """
+
+        print("Tilt the Wiimote slowly to the left, right, front and back " +
+              "as far as you want the level to measure.")
+
+        reports = self.events.queue(maxlen=ACCELEROMETER_RANGE)
+        values = []
+        end = time.time() + duration
+
+        while time.time() < end:
+            report = reports.get(end - time.time())
+
+            if report is not None:
+                values.append(report[:2])
+
+        self.events.unsubscribe(reports)
+
+        if len(values) == 0:
+            raise Exception("No accelerometer reports received!")
+
+        # percentiles ignore single spikes at the extremes
+        values = np.array(values)
+        min_value = float(np.min(np.percentile(values, 1, axis=0)))
+        max_value = float(np.max(np.percentile(values, 99, axis=0)))
+
+        if max_value - min_value < 60:
+            raise Exception("The Wiimote was not tilted far enough!")
+
+        self.min_value = min_value
+        self.max_value = max_value
+        self.level_value = (min_value + max_value) / 2
+
+        self.update_intervals()
+
+        save_calibration({'min_value': self.min_value,
+                          'level_value': self.level_value,
+                          'max_value': self.max_value},
+                         self.calibration_file)
+
+        print("calibrated: " + str(self.min_value) + " - " +
+              str(self.level_value) + " - " + str(self.max_value))
+
+    @staticmethod
+    def led_row(num, side):
+        """
+        creates the LED pattern of the given amount of LEDs on the given side
 
         :param num: the amount of LEDs to be activated
         :param side: the side from which the activation starts
-        :return: void
+        :return: the LED pattern
         """
 
         pattern = []
@@ -143,23 +418,39 @@ class BubbleLevel:
             for i in range(0, num):
                 pattern.append(1)
 
-        self.wm.leds = pattern
+        return pattern
 
 
 def input_from_cmd():
     """
-    checks if cmd args are exactly 2 in number
+    parses the cmd args; the mac address is required
 
-    :return: void
+    :return: the parsed arguments
     """
 
-    if len(sys.argv) != 2:
-        raise Exception("Insufficient number of CMD Args! Mac Address Required")
+    parser = argparse.ArgumentParser(description='wiimote bubble level')
+
+    parser.add_argument('mac_address')
+    parser.add_argument('--smoothing', choices=[EMA, MEDIAN, NONE],
+                        default=EMA)
+    parser.add_argument('--hysteresis', type=int, default=5)
+    parser.add_argument('--calibrate', action='store_true',
+                        help='derive and save the min and max values first')
+    parser.add_argument('--status-interval', type=float, default=1.0,
+                        help='seconds between two status lines; 0 disables '
+                             'them')
+    parser.add_argument('--telemetry',
+                        help='json file the counters and latency histograms '
+                             'are written to on exit')
+
+    args = parser.parse_args()
 
     input("Press the 'sync' button on the back of your Wiimote Plus " +
           "or buttons (1) and (2) on your classic Wiimote.\n" +
           "Press <return> once the Wiimote's LEDs start blinking.")
 
+    return args
+
 
 def main():
     """
@@ -167,10 +458,21 @@ def main():
 
     :return: void
     """
-    input_from_cmd()
+    args = input_from_cmd()
+
+    bl = BubbleLevel(args.mac_address, args.smoothing, args.hysteresis,
+                     status_interval=args.status_interval)
+
+    if args.calibrate:
+        bl.calibrate()
 
-    bl = BubbleLevel(sys.argv[1])
-    bl.level()
+    try:
+        bl.level()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.telemetry:
+            bl.telemetry.export(args.telemetry)
 
 
 if __name__ == '__main__':
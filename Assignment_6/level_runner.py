@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, 'common'))  # shared modules
+import level
+import sampling_scheduler as ss
+
+"""
+Runs a BubbleLevel for each of several wiimotes on one asyncio event loop.
+
+Every device has its own DeadlineScheduler and level state. The reports of a
+device are averaged between two of its updates by a callback on the
+wiimote's reader thread; the updates themselves all run on the event loop's
+thread, so the runner adds no thread per device.
+
+usage: ./level_runner.py 18:2A:7B:F3:F8:F5 00:1F:32:B3:C2:A0 --rate 20
+"""
+
+
+class DeviceRunner:
+    """
+    paces the updates of one BubbleLevel and measures their latency
+    """
+
+    def __init__(self, bubble_level, name, rate=20):
+        """
+        constructor
+
+        :param bubble_level: the BubbleLevel of the device
+        :param name: the name of the device in the report, e.g. its address
+        :param rate: the update rate in Hz
+
+        :return: void
+        """
+
+        self.level = bubble_level
+        self.name = name
+        self.scheduler = ss.DeadlineScheduler(rate)
+        self.is_running = True
+
+        # mean of the reports since the last update; written on the
+        # wiimote's thread, read on the event loop's thread
+        self.lock = threading.Lock()
+        self.sum = [0.0, 0.0, 0.0]
+        self.count = 0
+
+        self.updates = 0
+        self.step_total = 0.0
+        self.step_max = 0.0
+
+        bubble_level.events.subscribe(self.on_report)
+
+    def on_report(self, x, y, z, timestamp):
+        """
+        adds a report to the mean of the next update
+
+        :param x: the accelerometer value of the x axis
+        :param y: the accelerometer value of the y axis
+        :param z: the accelerometer value of the z axis
+        :param timestamp: the time the report arrived
+
+        :return: void
+        """
+
+        with self.lock:
+            self.sum[0] += x
+            self.sum[1] += y
+            self.sum[2] += z
+            self.count += 1
+
+    def take_report(self):
+        """
+        :return: the mean of the reports since the last call or None if no
+                 report arrived
+        """
+
+        with self.lock:
+            if self.count == 0:
+                return None
+
+            report = [v / self.count for v in self.sum]
+
+            self.sum = [0.0, 0.0, 0.0]
+            self.count = 0
+
+        return report
+
+    async def run(self, phase=0.0):
+        """
+        updates the level on every tick of the device's schedule
+
+        :param phase: the delay in seconds before the schedule starts
+
+        :return: void
+        """
+
+        await asyncio.sleep(phase)
+
+        while self.is_running:
+            await self.scheduler.wait_async()
+
+            report = self.take_report()
+
+            if report is None:
+                continue
+
+            start = time.perf_counter()
+            self.level.step(report)
+            duration = time.perf_counter() - start
+
+            self.updates += 1
+            self.step_total += duration
+            self.step_max = max(self.step_max, duration)
+
+    def report(self):
+        """
+        returns a one line summary of the device's loop latency
+
+        :return: the summary
+        """
+
+        step_mean = self.step_total / self.updates if self.updates else 0.0
+
+        return '%s: %s; step %.2f ms (max %.2f ms), %d LED writes' % (
+            self.name, str(self.scheduler), step_mean * 1000,
+            self.step_max * 1000, self.level.output.led_writes)
+
+
+async def report_periodically(runners, interval):
+    """
+    prints the latency of every device
+
+    :param runners: the DeviceRunners
+    :param interval: the time in seconds between two reports
+
+    :return: void
+    """
+
+    while True:
+        await asyncio.sleep(interval)
+
+        for runner in runners:
+            print(runner.report(), file=sys.stderr)
+
+
+async def run_all(runners, report_interval=5.0, duration=None):
+    """
+    runs the devices until the duration is over or forever
+
+    :param runners: the DeviceRunners
+    :param report_interval: the time in seconds between two latency reports
+    :param duration: the run time in seconds or None
+
+    :return: void
+    """
+
+    # staggered starts spread the updates of the devices over the period
+    tasks = [asyncio.ensure_future(
+        runner.run(runner.scheduler.period * i / len(runners)))
+        for i, runner in enumerate(runners)]
+    reporter = asyncio.ensure_future(report_periodically(runners,
+                                                         report_interval))
+
+    try:
+        await asyncio.wait_for(asyncio.gather(*tasks), duration)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        reporter.cancel()
+
+        for runner in runners:
+            runner.is_running = False
+
+
+def main():
+    """
+    application entry point
+
+    :return: void
+    """
+
+    parser = argparse.ArgumentParser(
+        description='runs a bubble level on each of several wiimotes')
+
+    parser.add_argument('mac_addresses', nargs='+')
+    parser.add_argument('--rate', type=float, default=20,
+                        help='update rate of every device in Hz')
+    parser.add_argument('--smoothing', choices=[level.EMA, level.MEDIAN,
+                                                level.NONE],
+                        default=level.EMA)
+    parser.add_argument('--hysteresis', type=int, default=5)
+    parser.add_argument('--report-interval', type=float, default=5.0)
+    parser.add_argument('--duration', type=float, default=None,
+                        help='stop after the given seconds')
+
+    args = parser.parse_args()
+
+    input("Press the 'sync' button on the back of your Wiimote Plus " +
+          "or buttons (1) and (2) on your classic Wiimotes.\n" +
+          "Press <return> once the Wiimotes' LEDs start blinking.")
+
+    runners = [DeviceRunner(level.BubbleLevel(address, args.smoothing,
+                                              args.hysteresis),
+                            address, args.rate)
+               for address in args.mac_addresses]
+
+    try:
+        asyncio.run(run_all(runners, args.report_interval, args.duration))
+    except KeyboardInterrupt:
+        pass
+
+    for runner in runners:
+        print(runner.report())
+
+
+if __name__ == '__main__':
+    main()
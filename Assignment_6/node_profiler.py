@@ -0,0 +1,284 @@
+import json
+import os
+import time
+import tracemalloc
+from pyqtgraph.Qt import QtCore, QtGui
+import telemetry as tm
+
+"""
+Opt-in profiling of the nodes of a pyqtgraph flowchart.
+
+NodeProfiler wraps the process() method of every node, and the render()
+method of the nodes drawing on a FrameClock, and records the call count and
+a latency histogram per node. With trace_memory it also records the bytes
+each call allocates, measured as the rise of tracemalloc's peak during the
+call; tracing slows every allocation down, so it is off by default. The
+statistics can be shown next to the nodes in the flowchart and dumped to a
+json file.
+
+analyze.py enables it if NODE_PROFILE is set: NODE_PROFILE=1 shows the
+overlay, NODE_PROFILE=<file>.json additionally dumps the statistics on
+exit, NODE_PROFILE_MEMORY=1 traces the allocations.
+"""
+
+PROFILED_METHODS = ['process', 'render']
+
+
+class NodeStats:
+    """
+    statistics of one profiled method of a node
+    """
+
+    def __init__(self):
+        """
+        constructor
+
+        :return: void
+        """
+
+        self.histogram = tm.LatencyHistogram()
+        self.bytes_total = 0
+        self.bytes_max = 0
+
+    def record(self, seconds, allocated=None):
+        """
+        counts a call
+
+        :param seconds: the duration of the call
+        :param allocated: the bytes allocated by the call or None if not
+                          traced
+        :return: void
+        """
+
+        self.histogram.record(seconds)
+
+        if allocated is not None:
+            self.bytes_total += allocated
+            self.bytes_max = max(self.bytes_max, allocated)
+
+    def to_dict(self):
+        """
+        :return: the call count, latencies and allocations as a dict
+        """
+
+        count = self.histogram.count
+
+        return {
+            'count': count,
+            'mean_ms': self.histogram.mean() * 1000,
+            'p99_ms': self.histogram.percentile(99) * 1000,
+            'max_ms': self.histogram.max * 1000,
+            'bytes_mean': self.bytes_total / count if count else 0.0,
+            'bytes_max': self.bytes_max
+        }
+
+
+class NodeProfiler:
+    """
+    wraps the methods of the nodes of a flowchart to measure them
+    """
+
+    def __init__(self, trace_memory=False):
+        """
+        constructor
+
+        :param trace_memory: whether the bytes allocated per call are
+                             recorded; starts tracemalloc
+        :return: void
+        """
+
+        self.trace_memory = trace_memory
+        self.stats = {}  # (node name, method) -> NodeStats
+        self.labels = {}  # node -> overlay text item
+        self.timer = None
+
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def attach(self, fc):
+        """
+        profiles all nodes of a flowchart, including the ones added later
+
+        :param fc: the flowchart
+        :return: void
+        """
+
+        for node in fc.nodes().values():
+            self.wrap(node)
+
+        fc.sigChartChanged.connect(self.on_chart_changed)
+
+    def on_chart_changed(self, fc, action, node):
+        if action == 'add':
+            self.wrap(node)
+
+    def wrap(self, node):
+        """
+        replaces the profiled methods of a node by measuring ones
+
+        :param node: the node
+        :return: void
+        """
+
+        for method in PROFILED_METHODS:
+            original = getattr(node, method, None)
+
+            if original is None or hasattr(original, 'profiled'):
+                continue
+
+            setattr(node, method, self.__measure_(node, method, original))
+
+    def __measure_(self, node, method, original):
+        """
+        :param node: the node
+        :param method: the name of the method
+        :param original: the bound method
+        :return: a function calling original and recording the call
+        """
+
+        def measured(*args, **kwds):
+            if self.trace_memory:
+                before = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+
+            start = time.perf_counter()
+
+            try:
+                return original(*args, **kwds)
+            finally:
+                duration = time.perf_counter() - start
+                allocated = None
+
+                if self.trace_memory:
+                    allocated = max(0, tracemalloc.get_traced_memory()[1] -
+                                    before)
+
+                self.node_stats(node.name(), method).record(duration,
+                                                            allocated)
+
+        measured.profiled = True
+
+        return measured
+
+    def node_stats(self, name, method):
+        """
+        :param name: the name of a node
+        :param method: the name of the method
+        :return: the NodeStats of the method of the node
+        """
+
+        key = (name, method)
+        stats = self.stats.get(key)
+
+        if stats is None:
+            stats = self.stats[key] = NodeStats()
+
+        return stats
+
+    def snapshot(self):
+        """
+        :return: a dict mapping 'node' and 'node.render' to the statistics,
+                 slowest mean first
+        """
+
+        items = sorted(self.stats.items(),
+                       key=lambda item: -item[1].histogram.mean())
+
+        return {(name if method == 'process' else name + '.' + method):
+                stats.to_dict() for (name, method), stats in items}
+
+    def summary(self, name):
+        """
+        :param name: the name of a node
+        :return: the overlay text of the node: per method the call count,
+                 the mean and p99 duration and the mean bytes allocated
+        """
+
+        lines = []
+
+        for method in PROFILED_METHODS:
+            stats = self.stats.get((name, method))
+
+            if stats is None:
+                continue
+
+            values = stats.to_dict()
+            line = '%s %dx %.3f/%.3f ms' % (method, values['count'],
+                                           values['mean_ms'],
+                                           values['p99_ms'])
+
+            if self.trace_memory:
+                line += ' %.0f B' % values['bytes_mean']
+
+            lines.append(line)
+
+        return '\n'.join(lines)
+
+    def show_overlay(self, fc, interval=1.0):
+        """
+        shows the statistics below every node in the flowchart and updates
+        them periodically
+
+        :param fc: the flowchart
+        :param interval: the time in seconds between two updates
+        :return: void
+        """
+
+        self.timer = QtCore.QTimer()
+        self.timer.timeout.connect(lambda: self.update_overlay(fc))
+        self.timer.start(int(interval * 1000))
+
+    def update_overlay(self, fc):
+        """
+        updates the text below every node
+
+        :param fc: the flowchart
+        :return: void
+        """
+
+        for node in fc.nodes().values():
+            label = self.labels.get(node)
+
+            if label is None:
+                item = node.graphicsItem()
+                label = QtGui.QGraphicsSimpleTextItem(item)
+                label.setPos(0, item.boundingRect().height() + 2)
+                self.labels[node] = label
+
+            label.setText(self.summary(node.name()))
+
+    def dump(self, file):
+        """
+        writes the statistics to a json file
+
+        :param file: the path of the file
+        :return: void
+        """
+
+        with open(file, 'w') as profile_file:
+            json.dump({'trace_memory': self.trace_memory,
+                       'nodes': self.snapshot()}, profile_file, indent=4)
+
+
+def attach_if_requested(fc):
+    """
+    profiles the nodes of a flowchart if NODE_PROFILE is set
+
+    :param fc: the flowchart
+    :return: the NodeProfiler or None
+    """
+
+    setting = os.environ.get('NODE_PROFILE')
+
+    if not setting:
+        return None
+
+    profiler = NodeProfiler(bool(os.environ.get('NODE_PROFILE_MEMORY')))
+    profiler.attach(fc)
+    profiler.show_overlay(fc)
+
+    if setting.endswith('.json'):
+        QtGui.QApplication.instance().aboutToQuit.connect(
+            lambda: profiler.dump(setting))
+
+    return profiler
@@ -0,0 +1,243 @@
+import bisect
+import json
+import math
+import sys
+import time
+
+"""
+Loop telemetry: counters, latency histograms and a rate-limited status line.
+
+Recording a latency costs a bisect into fixed logarithmic buckets, so the
+histograms can stay enabled in a loop running at the sensor's rate. The
+status line is printed at most once per interval instead of once per
+iteration; export() writes everything to a json file.
+"""
+
+# 10 buckets per decade from 1 us to 10 s
+BUCKET_BOUNDS = [10 ** (e / 10.0) for e in range(-60, 11)]
+
+
+class LatencyHistogram:
+    """
+    histogram of durations in logarithmic buckets
+    """
+
+    def __init__(self, bounds=BUCKET_BOUNDS):
+        """
+        constructor
+
+        :param bounds: the ascending upper bounds of the buckets in seconds;
+                       longer durations are counted in an overflow bucket
+
+        :return: void
+        """
+
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        """
+        counts a duration
+
+        :param seconds: the duration in seconds
+
+        :return: void
+        """
+
+        self.buckets[bisect.bisect_left(self.bounds, seconds)] += 1
+
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def mean(self):
+        """
+        :return: the mean duration in seconds
+        """
+
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p):
+        """
+        returns the upper bound of the bucket containing the percentile
+
+        :param p: the percentile (0 - 100)
+
+        :return: the duration in seconds, at most the maximum recorded one
+        """
+
+        if self.count == 0:
+            return 0.0
+
+        rank = max(1, int(math.ceil(self.count * p / 100.0)))
+        seen = 0
+
+        for i, count in enumerate(self.buckets):
+            seen += count
+
+            if seen >= rank:
+                if i == len(self.bounds):
+                    return self.max
+
+                return min(self.bounds[i], self.max)
+
+        return self.max
+
+    def to_dict(self):
+        """
+        :return: the statistics and the non-empty buckets as a dict
+        """
+
+        return {
+            'count': self.count,
+            'mean_ms': self.mean() * 1000,
+            'p50_ms': self.percentile(50) * 1000,
+            'p99_ms': self.percentile(99) * 1000,
+            'max_ms': self.max * 1000,
+            'buckets': [{'le_ms': (self.bounds[i] * 1000
+                                   if i < len(self.bounds) else None),
+                         'count': count}
+                        for i, count in enumerate(self.buckets) if count > 0]
+        }
+
+
+class Telemetry:
+    """
+    counters and latency histograms of a loop
+    """
+
+    def __init__(self, status_interval=1.0, stream=sys.stderr):
+        """
+        constructor
+
+        :param status_interval: the minimum time in seconds between two
+                                status lines; 0 disables them
+        :param stream: the stream the status lines are written to
+
+        :return: void
+        """
+
+        self.status_interval = status_interval
+        self.stream = stream
+
+        self.counters = {}
+        self.histograms = {}
+        self.sources = []
+
+        self.start = time.monotonic()
+        self.last_status = self.start
+        self.last_iterations = 0
+
+    def count(self, name, amount=1):
+        """
+        increases a counter
+
+        :param name: the name of the counter
+        :param amount: the increment
+
+        :return: void
+        """
+
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record(self, name, seconds):
+        """
+        adds a duration to a histogram
+
+        :param name: the name of the histogram
+        :param seconds: the duration in seconds
+
+        :return: void
+        """
+
+        histogram = self.histograms.get(name)
+
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyHistogram()
+
+        histogram.record(seconds)
+
+    def add_source(self, source):
+        """
+        adds counters kept elsewhere, e.g. WiimoteOutput.stats
+
+        :param source: a callable returning a dict of counters
+
+        :return: void
+        """
+
+        self.sources.append(source)
+
+    def snapshot(self):
+        """
+        :return: all counters, including the ones of the sources
+        """
+
+        counters = dict(self.counters)
+
+        for source in self.sources:
+            counters.update(source())
+
+        return counters
+
+    def status(self, text=''):
+        """
+        prints a status line if the status interval passed since the last
+        one; cheap to call on every iteration
+
+        :param text: a callable returning text prepended to the line, only
+                     called if the line is printed
+
+        :return: True if a line was printed
+        """
+
+        now = time.monotonic()
+
+        if self.status_interval <= 0 or \
+                now - self.last_status < self.status_interval:
+            return False
+
+        iterations = self.counters.get('iterations', 0)
+        rate = (iterations - self.last_iterations) / (now - self.last_status)
+
+        self.last_status = now
+        self.last_iterations = iterations
+
+        parts = [text() if callable(text) else text, '%.1f it/s' % rate]
+
+        for name in sorted(self.histograms):
+            histogram = self.histograms[name]
+            parts.append('%s p50 %.2f ms p99 %.2f ms' % (
+                name, histogram.percentile(50) * 1000,
+                histogram.percentile(99) * 1000))
+
+        counters = self.snapshot()
+        parts.append(', '.join('%s %d' % (name, counters[name])
+                               for name in sorted(counters)
+                               if name != 'iterations'))
+
+        print(' | '.join(p for p in parts if p), file=self.stream)
+
+        return True
+
+    def export(self, file):
+        """
+        writes the counters and histograms to a json file
+
+        :param file: the path of the file
+
+        :return: void
+        """
+
+        with open(file, 'w') as telemetry_file:
+            json.dump({
+                'duration_s': time.monotonic() - self.start,
+                'counters': self.snapshot(),
+                'histograms': {name: histogram.to_dict()
+                               for name, histogram in
+                               sorted(self.histograms.items())}
+            }, telemetry_file, indent=4)
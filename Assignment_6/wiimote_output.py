@@ -0,0 +1,100 @@
+import threading
+
+"""
+Output layer for the LEDs and the rumble motor of a connected wiimote.
+
+Every LED write is a Bluetooth report, so WiimoteOutput only sends a pattern
+if it differs from the last one sent. The wiimote module's rumble() blocks
+for the length of the rumble; WiimoteOutput runs it on a timer thread, so
+the loop driving the output keeps reading at its rate.
+"""
+
+
+class WiimoteOutput:
+    """
+    change-only LED writes and non-blocking rumbles
+    """
+
+    def __init__(self, wm):
+        """
+        constructor
+
+        :param wm: the connected wiimote
+
+        :return: void
+        """
+
+        self.wm = wm
+
+        self.pattern = None  # unknown until the first write
+        self.rumble_timer = None
+
+        self.led_writes = 0
+        self.led_skips = 0
+        self.rumbles = 0
+        self.rumble_skips = 0
+
+    def set_leds(self, pattern):
+        """
+        sends an LED pattern unless it is already shown
+
+        :param pattern: a list of 4 values, truthy for an active LED
+
+        :return: True if the pattern was sent
+        """
+
+        pattern = [bool(v) for v in pattern]
+
+        if pattern == self.pattern:
+            self.led_skips += 1
+            return False
+
+        self.wm.leds = pattern
+        self.pattern = pattern
+        self.led_writes += 1
+
+        return True
+
+    def is_rumbling(self):
+        """
+        :return: True while a scheduled rumble has not finished
+        """
+
+        return self.rumble_timer is not None and self.rumble_timer.is_alive()
+
+    def rumble(self, length=0.1, delay=0.0):
+        """
+        schedules a rumble on a timer thread and returns immediately; ignored
+        while another rumble is scheduled or running
+
+        :param length: the duration of the rumble in seconds
+        :param delay: the time in seconds until the rumble starts
+
+        :return: True if the rumble was scheduled
+        """
+
+        if self.is_rumbling():
+            self.rumble_skips += 1
+            return False
+
+        self.rumble_timer = threading.Timer(delay, self.wm.rumble, [length])
+        self.rumble_timer.daemon = True
+        self.rumble_timer.start()
+        self.rumbles += 1
+
+        return True
+
+    def stats(self):
+        """
+        returns the output counters
+
+        :return: a dict containing led_writes, led_skips, rumbles and
+                 rumble_skips
+        """
+
+        return {
+            'led_writes': self.led_writes,
+            'led_skips': self.led_skips,
+            'rumbles': self.rumbles,
+            'rumble_skips': self.rumble_skips
+        }
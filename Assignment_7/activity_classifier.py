@@ -1,7 +1,10 @@
-import csv
+import os
+import sys
 import numpy as np
-from sklearn import svm
-import itertools as it
+import classifier_backends as cb
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, 'common'))  # shared modules
+import trainings_data as td
 
 """
 global identifier variables
@@ -13,136 +16,150 @@ GESTURE_1 = 'GESTURE_1'
 NOTHING = 'NOTHING'
 
 
-class TrainingsDataReader:
-    @staticmethod
-    def get_trainings_data(file):
-        values = []
-
-        with open(file, "r", newline='') as csvfile:
-            reader = csv.reader(csvfile, delimiter=';')
-
-            i = 0
-            ges_index = 0
-            for row in reader:
-                if i == 0:
-                    i = 1
-                    continue
-
-                x, y, z = row[1:4]
+def gesture_identifier(a_id):
+    """
+    returns the gesture identifier belonging to an activity id of the csv file
 
-                if int(row[0]) != ges_index:
-                    values.append([])
-                    ges_index += 1
+    :param a_id: the activity id (1 -> GESTURE_1, 2 -> GESTURE_2, ...)
 
-                values[ges_index - 1].append([float(x), float(y), float(z)])
+    :return: the gesture identifier
+    """
 
-        return values
+    return 'GESTURE_' + str(a_id)
 
 
-class Classifier:
+class TrainingsDataReader:
     """
-    class responsible for classifying activities
+    helper class for reading the accelerometer trainings data csv files
     """
 
-    def __init__(self, file_path=None, train_data=None, activity=None):
+    @staticmethod
+    def get_records(file):
         """
-        constructor
+        reads the whole csv or binary file into typed columns in one call
 
-        :param file_path: a potential path to a input csv file
-        :param train_data: a potential array of accelerometer values
-        :param activity: a potential name of an activity
+        :param file: the file to read
 
-        :return: void
+        :return: a structured array of trainings_data.RECORD_DTYPE
         """
 
-        if file_path is None and train_data is None:
-            print("Classifier has no trainings data!\nNeeds csv file or array!")
-            exit(0)
-        else:
-            self.data_gesture_1 = None
-            self.data_gesture_2 = None
-            self.data_gesture_3 = None
+        return td.read_records(file)
 
-            self.data_gesture_1_class = []
-            self.data_gesture_2_class = []
-            self.data_gesture_3_class = []
+    @staticmethod
+    def group_records(records):
+        """
+        groups records by their activity id; the rows of an activity do not
+        need to be contiguous, their order within an activity is preserved
 
-            self.classifier = svm.SVC()
-            self.train(file_path, train_data, activity)
+        :param records: a structured array of trainings_data.RECORD_DTYPE
 
-    def __classify_gesture_1_(self, gesture_data):
+        :return: a dict mapping each activity id (ascending) to its records
         """
-        classifies the shake activity
 
-        :param gesture_data: the data which needs to be checked for the
-               shaking activity
+        records = records[np.argsort(records['a_id'], kind='stable')]
+        ids, starts = np.unique(records['a_id'], return_index=True)
 
-        :return: a boolean depicting whether gesture_1 occurred or did not occur
+        return dict(zip(ids.tolist(), np.split(records, starts[1:])))
+
+    @staticmethod
+    def get_recordings(file):
         """
+        reads a csv file and groups its rows by activity id
 
-        ges1, ges2, ges3 = self.__get_activity_occurrences_(gesture_data)
+        :param file: the file to read
 
-        return ges1 > ges2 and ges1 > ges3
+        :return: a dict mapping each activity id to its records
+        """
+
+        return TrainingsDataReader.group_records(
+            TrainingsDataReader.get_records(file))
 
-    def __classify_gesture_2_(self, gesture_data):
+    @staticmethod
+    def iter_recordings(file, chunk_size=100000):
         """
-        classifies the whip activity
+        reads a csv or binary file chunk by chunk, so files larger than the
+        memory can be processed; yields every contiguous run of an activity id
+        within a chunk, i.e. a long recording arrives in several consecutive
+        pieces
 
-        :param gesture_data: the data which needs to be checked for the
-               whipping activity
+        :param file: the file to read
+        :param chunk_size: the maximum amount of rows parsed at once
 
-        :return: a boolean depicting whether gesture_2 occurred or did not occur
+        :return: a generator of (activity id, records) tuples
         """
 
-        ges1, ges2, ges3 = self.__get_activity_occurrences_(gesture_data)
+        for chunk in td.iter_chunks(file, chunk_size):
+            starts = np.flatnonzero(np.diff(chunk['a_id'])) + 1
 
-        return ges2 > ges1 and ges2 > ges3
+            for run in np.split(chunk, starts):
+                yield int(run['a_id'][0]), run
 
-    def __classify_gesture_3_(self, gesture_data):
+    @staticmethod
+    def get_samples(records):
         """
-        classifies the wiggle activity
+        returns the accelerometer values of the given records
 
-        :param gesture_data: the data which needs to be checked for the
-               wiggling activity
+        :param records: a structured array of trainings_data.RECORD_DTYPE
 
-        :return: a boolean depicting whether gesture_3 occurred or did not occur
+        :return: an array of shape (n, 3) containing the x, y and z values
         """
 
-        ges1, ges2, ges3 = self.__get_activity_occurrences_(gesture_data)
-
-        return ges3 > ges1 and ges3 > ges2
+        return np.column_stack((records['x'], records['y'], records['z']))
 
-    def __get_activity_occurrences_(self, gesture_data):
+    @staticmethod
+    def get_trainings_data(file):
         """
-        returns the amount of occurrences of each possible activity in its
-                prediction
+        reads the accelerometer values of each activity of a csv file
 
-        :param gesture_data: the data from which the occurrences are extracted
+        :param file: the file to read
 
-        :return: the occurrences for gesture_1, gesture_2
-                 and gesture_3 predictions
+        :return: a list containing an array of shape (n, 3) per activity
+                 ordered by activity id
         """
 
-        prediction = self.__prediction_(gesture_data)
+        return [TrainingsDataReader.get_samples(records) for records in
+                TrainingsDataReader.get_recordings(file).values()]
 
-        if prediction is None:
-            return 0, 0, 0
 
-        ges1 = 0
-        ges2 = 0
-        ges3 = 0
+class Classifier:
+    """
+    class responsible for classifying activities
+    """
+
+    def __init__(self, file_path=None, train_data=None, activity=None,
+                 n_jobs=-1, backend=cb.SVC, backend_params=None,
+                 fft_length=None):
+        """
+        constructor
+
+        :param file_path: a potential path to a input csv file
+        :param train_data: a potential array of accelerometer values or a dict
+                           mapping activity identifiers to such arrays
+        :param activity: a potential name of an activity
+        :param n_jobs: the amount of cores the fits are spread over (-1 uses
+                       all cores)
+        :param backend: the identifier of the model used for prediction; see
+                        classifier_backends.BACKENDS
+        :param backend_params: optional keyword arguments for the model, e.g.
+                               kernel, C and gamma of the svc backend
+        :param fft_length: the amount of samples of an activity's trainings
+                           data which is fourier transformed (None uses all)
 
-        for i in prediction:
-            if i == 1:
-                ges1 += 1
+        :return: void
+        """
 
-            if i == 2:
-                ges2 += 1
+        if file_path is None and train_data is None:
+            print("Classifier has no trainings data!\nNeeds csv file or array!")
+            exit(0)
+        else:
+            self.gesture_data = {}
 
-            if i == 3:
-                ges3 += 1
+            self.fft_length = fft_length
 
-        return ges1, ges2, ges3
+            self.is_fitted = False
+            self.classifier = cb.create_backend(backend, n_jobs,
+                                                backend_params)
+            self.train(file_path, train_data, activity)
 
     def __prediction_(self, gesture_data):
         """
@@ -155,18 +172,22 @@ class Classifier:
                  have been collected
         """
 
-        sum_vals = []
-
-        for i in range(0, len(gesture_data)):
-            sum_vals.append([(gesture_data[i][0] +
-                             gesture_data[i][1] +
-                             gesture_data[i][2] -
-                             3 * 512) / 3])
-
-        if len(sum_vals) < 30:
+        if len(gesture_data) < 30 or not self.is_fitted:
             return None
 
-        data = self.__perform_fft_(sum_vals)
+        sum_vals = (np.sum(np.asarray(gesture_data, dtype=float),
+                           axis=1) - 3 * 512) / 3
+
+        if self.fft_length is None:
+            # the trainings features span whole recordings, so a transform of
+            # the gesture alone would not line up with their bins; the fft
+            # runs along the axis of length 1 instead, i.e. the features are
+            # the scaled sums of the first half of the gesture
+            data = self.__perform_fft_(sum_vals.reshape(-1, 1))
+        else:
+            # cropped or padded to the length of the trainings features
+            data = self.__perform_fft_(sum_vals,
+                                       self.fft_length).reshape(-1, 1)
 
         return self.classifier.predict(data)
 
@@ -179,51 +200,60 @@ class Classifier:
         :return: void
         """
 
-        trainings_data = TrainingsDataReader.get_trainings_data(file)
+        recordings = TrainingsDataReader.get_recordings(file)
 
-        self.__train_activity_(trainings_data[0], GESTURE_1, False)
-        self.__train_activity_(trainings_data[1], GESTURE_2, False)
-        self.__train_activity_(trainings_data[2], GESTURE_3)
+        self.__train_activities_(
+            {gesture_identifier(a_id): TrainingsDataReader.get_samples(records)
+             for a_id, records in recordings.items()})
 
-    def __fit_data_to_svm_(self):
+    def __train_activities_(self, trainings_data):
         """
-        fits data to support vector machine
+        trains several activities and fits the backend once
+
+        :param trainings_data: a dict mapping activity identifiers to their
+                               accelerometer values
 
         :return: void
         """
 
-        self.data_gesture_1_class.clear()
-        self.data_gesture_2_class.clear()
-        self.data_gesture_3_class.clear()
+        for activity, data in trainings_data.items():
+            self.__train_activity_(data, activity, False)
 
-        data = []
+        self.__fit_data_()
 
-        for item in it.chain(self.data_gesture_1, self.data_gesture_2,
-                             self.data_gesture_3):
-            data.append([item])
+    def __fit_data_(self):
+        """
+        fits data to the backend
 
-        [self.data_gesture_1_class.append(1)
-         for i in range(0, len(self.data_gesture_1))]
+        :return: void
+        """
 
-        [self.data_gesture_2_class.append(2)
-         for i in range(0, len(self.data_gesture_2))]
+        if len(self.gesture_data) < 2:
+            self.is_fitted = False
+            return
 
-        [self.data_gesture_3_class.append(3)
-         for i in range(0, len(self.data_gesture_3))]
+        activities = list(self.gesture_data.keys())
+        features = list(self.gesture_data.values())
 
-        data_classes = self.data_gesture_1_class + self.data_gesture_2_class + \
-            self.data_gesture_3_class
+        data = np.concatenate(features).reshape(-1, 1)
+        data_classes = np.repeat(activities, [len(f) for f in features])
 
         self.classifier.fit(data, data_classes)
+        self.is_fitted = True
 
-    def __perform_fft_(self, data):
+    def __perform_fft_(self, data, n=None):
         """
         performs fourier transformation on given data
 
         :param data: the data to be transformed
+        :param n: an optional length the data is cropped or padded to
 
         :return: the fourier transformed data
         """
+
+        if n is not None:
+            data = np.pad(data[:n], (0, max(0, n - len(data))))
+
         return np.abs(np.fft.fft(data) / len(data))[1:int(len(data)/2)]
 
     def __train_activity_(self, data, activity, needs_fit=True):
@@ -233,26 +263,18 @@ class Classifier:
         :param data: the new trainings data for the activity
         :param activity: the identifier of the activity
         :param needs_fit: an optional boolean depicting the necessity for data
-               fitting to the support vector machine
+               fitting to the backend
 
         :return: void
         """
 
-        sum_vals = []
-
-        for k in range(0, len(data)):
-            sum_vals.append((data[k][0] + data[k][1] + data[k][2] -
-                             3 * 512) / 3)
+        sum_vals = (np.sum(np.asarray(data, dtype=float), axis=1) - 3 * 512) / 3
 
-        if activity == GESTURE_1:
-            self.data_gesture_1 = self.__perform_fft_(sum_vals)
-        elif activity == GESTURE_2:
-            self.data_gesture_2 = self.__perform_fft_(sum_vals)
-        elif activity == GESTURE_3:
-            self.data_gesture_3 = self.__perform_fft_(sum_vals)
+        self.gesture_data[activity] = self.__perform_fft_(sum_vals,
+                                                          self.fft_length)
 
         if needs_fit:
-            self.__fit_data_to_svm_()
+            self.__fit_data_()
 
     def train(self, file_path, train_data, activity):
         """
@@ -261,7 +283,8 @@ class Classifier:
 
         :param file_path: a path to a csv file
         :param train_data: a list of accelerometer values which are used for
-                           training
+                           training or a dict mapping activity identifiers to
+                           such lists
         :param activity: the name of the activity
 
         :return: void
@@ -269,26 +292,54 @@ class Classifier:
 
         if file_path is not None and train_data is None:
             self.__train_from_file_(file_path)
+        elif file_path is None and isinstance(train_data, dict):
+            self.__train_activities_(train_data)
         elif file_path is None and train_data is not None and \
                 activity is not None:
             self.__train_activity_(train_data, activity)
 
         return self
 
+    def remove(self, activity):
+        """
+        removes an activity and its trainings data from the classifier
+
+        :param activity: the identifier of the activity
+
+        :return: void
+        """
+
+        if self.gesture_data.pop(activity, None) is not None:
+            self.__fit_data_()
+
+    def activities(self):
+        """
+        returns the identifiers of all trained activities
+
+        :return: a list of activity identifiers
+        """
+
+        return list(self.gesture_data.keys())
+
     def classify(self, gesture_data):
         """
-        classifies an action based on the given gesture data
+        classifies an action based on the given gesture data; the activity
+        predicted for the most frequencies wins, a tie results in NOTHING
 
         :param gesture_data: the data to be classified
 
         :return: the identifier of the classified activity
         """
 
-        if self.__classify_gesture_1_(gesture_data):
-            return GESTURE_1
-        elif self.__classify_gesture_2_(gesture_data):
-            return GESTURE_2
-        elif self.__classify_gesture_3_(gesture_data):
-            return GESTURE_3
+        prediction = self.__prediction_(gesture_data)
+
+        if prediction is None:
+            return NOTHING
+
+        activities, occurrences = np.unique(prediction, return_counts=True)
+        best = np.flatnonzero(occurrences == occurrences.max())
+
+        if len(best) != 1:
+            return NOTHING
 
-        return NOTHING
+        return str(activities[best[0]])
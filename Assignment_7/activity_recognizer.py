@@ -3,14 +3,23 @@
 # -*- coding: utf-8 -*-
 
 from PyQt5 import uic, QtGui, QtCore, Qt
+import os
 import sys
+import copy
 import webbrowser as wb
-import sh
 from sklearn import svm
 import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, 'common'))  # shared modules
+import wiimote_sim
+wiimote_sim.install_if_requested()  # WIIMOTE_SIM=<signal> simulates it
 import wiimote
 import time
 import activity_classifier as ac
+import dtw_classifier as dc
+import sample_buffer as sb
+import sampling_scheduler as ss
+import action_dispatcher as ad
 
 # FOR THE LULZ
 TAYLOR_SWIFT = 'https://www.youtube.com/watch?v=nfWlot6h_JM'
@@ -23,8 +32,7 @@ HELP_TEXT = 'Buttons:\n' + \
             'Gesture Mode: Activate the gesture tracking via wiimote.\n' + \
             'No Gesture Mode: Deactivates the Gesture Mode.\n' + \
             'Connect: connects the wiimote with the given address\n' + \
-            '+: adds a new gesture to the list if there are less than ' + \
-            '3\n' + \
+            '+: adds a new gesture to the list\n' + \
             '\n' + \
             'List Item: right clicking a list item opens a context ' + \
             'menu\n' + \
@@ -47,27 +55,41 @@ HELP_TEXT = 'Buttons:\n' + \
             'right and then right to left without rotating it ' + \
             '(it still faces away from you!) Continue this motion for ' + \
             'the wiggling gesture.\n\n' + \
-            'Only three gestures can be stored at the same time. You ' + \
-            'can remove one and add a new one. If you do so you have ' + \
-            'to select Retrain Gesture from its context menu.'
+            'Any number of gestures can be stored. After adding a new ' + \
+            'one you have to select Retrain Gesture from its context menu.'
 
 class WiimoteThread(QtCore.QThread):
     """
-    simple thread class for concurrent wiimote accelerometer data retrieval
+    thread class reading the wiimote's accelerometer and A button at 50 Hz;
+    the timestamped samples are pushed into a SampleRingBuffer and the UI is
+    notified in batches, so a busy UI neither drops samples nor queues signals
     """
 
     update_trigger = QtCore.pyqtSignal()
 
-    def __init__(self):
+    def __init__(self, sample_buffer, batch_size=5):
         """
         constructor
 
+        :param sample_buffer: the SampleRingBuffer receiving the samples
+        :param batch_size: the amount of samples collected before the UI is
+                           notified (the release of A is notified instantly)
+
         :return: void
         """
 
         super(WiimoteThread, self).__init__()
         self.is_looping = True
 
+        self.wm = None
+        self.sample_buffer = sample_buffer
+        self.batch_size = batch_size
+
+        self.scheduler = ss.DeadlineScheduler(50)  # sampling rate of 50 Hz
+
+        # reset by the consumer after reading; prevents queued up signals
+        self.is_notified = False
+
     def run(self):
         """
         looped action of the thread
@@ -75,9 +97,79 @@ class WiimoteThread(QtCore.QThread):
         :return: void
         """
 
+        was_pressed = False
+
         while self.is_looping:
-            time.sleep(0.02)  # sampling rate of 50 Hz
-            self.update_trigger.emit()
+            self.scheduler.wait()
+
+            wm = self.wm
+
+            if wm is None:
+                continue
+
+            x, y, z = wm.accelerometer
+            is_pressed = wm.buttons["A"]
+
+            self.sample_buffer.push(x, y, z, is_pressed, time.time())
+
+            is_released = was_pressed and not is_pressed
+            was_pressed = is_pressed
+
+            if not self.is_notified and \
+                    (is_released or
+                     self.sample_buffer.available() >= self.batch_size):
+                self.is_notified = True
+                self.update_trigger.emit()
+
+
+class RetrainThread(QtCore.QThread):
+    """
+    worker thread fitting a copy of the classifier on a snapshot of recorded
+    gesture data, or removing an activity from a copy, so the live classifier
+    keeps serving predictions meanwhile
+    """
+
+    progress_trigger = QtCore.pyqtSignal(int, str)
+    finished_trigger = QtCore.pyqtSignal(object)
+
+    def __init__(self, classifier, data, activity):
+        """
+        constructor
+
+        :param classifier: the live classifier which serves as template
+        :param data: a snapshot of the recorded accelerometer values or None
+                     to remove the activity
+        :param activity: the identifier of the activity to be retrained or
+                         removed
+
+        :return: void
+        """
+
+        super(RetrainThread, self).__init__()
+        self.classifier = classifier
+        self.data = data
+        self.activity = activity
+
+    def run(self):
+        """
+        copies the classifier, trains the copy or removes the activity from
+        it and hands it over via signal
+
+        :return: void
+        """
+
+        self.progress_trigger.emit(0, 'copying classifier')
+        classifier = copy.deepcopy(self.classifier)
+
+        if self.data is None:
+            self.progress_trigger.emit(25, 'removing ' + self.activity)
+            classifier.remove(self.activity)
+        else:
+            self.progress_trigger.emit(25, 'fitting ' + self.activity)
+            classifier.train(None, self.data, self.activity)
+
+        self.progress_trigger.emit(100, 'done')
+        self.finished_trigger.emit(classifier)
 
 
 class Window(Qt.QMainWindow):
@@ -85,11 +177,14 @@ class Window(Qt.QMainWindow):
     class responsible for the UI
     """
 
-    def __init__(self):
+    def __init__(self, classifier_class=ac.Classifier):
         """
         constructor
         UI-elements setup and variables setup
 
+        :param classifier_class: the class used for classification, either
+               activity_classifier.Classifier or dtw_classifier.DTWClassifier
+
         :return: void
         """
 
@@ -113,6 +208,12 @@ class Window(Qt.QMainWindow):
             ac.GESTURE_3: 'Wiggle'
         }
 
+        self.gesture_actions = {
+            ac.GESTURE_1: self.on_gesture_1_activity,
+            ac.GESTURE_2: self.on_gesture_2_activity,
+            ac.GESTURE_3: self.on_gesture_3_activity
+        }
+
         self.use_action = None
         self.retrain_action = None
         self.remove_action = None
@@ -120,12 +221,15 @@ class Window(Qt.QMainWindow):
         self.is_pressed = False
         self.is_classified = False
         self.uses_gestures = False
-        self.recognizes_gesture_1 = False
-        self.recognizes_gesture_2 = False
-        self.recognizes_gesture_3 = False
+        self.recognized_gestures = set()
         self.is_retraining = False
 
-        self.classifier = ac.Classifier(INITIAL_TRAININGS_DATA_FILE)
+        self.classifier = classifier_class(INITIAL_TRAININGS_DATA_FILE)
+        self.retrain_thread = None
+
+        self.action_dispatcher = ad.ActionDispatcher()
+        self.action_dispatcher.finished_trigger.connect(self.on_action_finished)
+        self.action_dispatcher.failed_trigger.connect(self.on_action_failed)
 
         self.gesture_data = []
 
@@ -139,7 +243,9 @@ class Window(Qt.QMainWindow):
 
         self.wm = None
 
-        self.wiimote_thread = WiimoteThread()
+        self.sample_buffer = sb.SampleRingBuffer()
+
+        self.wiimote_thread = WiimoteThread(self.sample_buffer)
         self.wiimote_thread.update_trigger.connect(self.get_wiimote_input)
         self.wiimote_thread.start()
         self.win.show()
@@ -147,19 +253,17 @@ class Window(Qt.QMainWindow):
     def connect_wiimote(self):
             try:
                 self.wm = wiimote.connect(self.address_le.text())
+                self.wiimote_thread.wm = self.wm
             except Exception:
                 pass
 
     def add(self):
-        if self.gesture_list_widget_item_count == 3:
-            print('Cannot have more gestures than 3. Delete one first!')
-        else:
-            if self.gesture_list_widget_item_count == 0:
-                self.add_gesture(ac.GESTURE_1)
-            elif self.gesture_list_widget_item_count == 1:
-                self.add_gesture(ac.GESTURE_2)
-            elif self.gesture_list_widget_item_count == 2:
-                self.add_gesture(ac.GESTURE_3)
+        a_id = 1
+
+        while ac.gesture_identifier(a_id) in self.gesture_relations:
+            a_id += 1
+
+        self.add_gesture(ac.gesture_identifier(a_id))
 
     def add_gesture(self, required_gesture):
         gesture_name, ok = \
@@ -169,15 +273,8 @@ class Window(Qt.QMainWindow):
         self.gesture_list_widget_item_count += 1
         self.gesture_list_widget.addItem(Qt.QListWidgetItem(gesture_name))
 
-        if required_gesture == ac.GESTURE_1:
-            self.gesture_relations[ac.GESTURE_1] = gesture_name
-            self.recognizes_gesture_1 = True
-        elif required_gesture == ac.GESTURE_2:
-            self.gesture_relations[ac.GESTURE_2] = gesture_name
-            self.recognizes_gesture_2 = True
-        elif required_gesture == ac.GESTURE_3:
-            self.gesture_relations[ac.GESTURE_3] = gesture_name
-            self.recognizes_gesture_3 = True
+        self.gesture_relations[required_gesture] = gesture_name
+        self.recognized_gestures.add(required_gesture)
 
     def self_show(self):
         print(self.list_widget.currentItem().text())
@@ -186,14 +283,8 @@ class Window(Qt.QMainWindow):
         self.gesture_list_widget.setContextMenuPolicy(
             QtCore.Qt.ActionsContextMenu)
 
-        self.gesture_list_widget.addItem(
-            Qt.QListWidgetItem(self.gesture_relations[ac.GESTURE_1]))
-
-        self.gesture_list_widget.addItem(
-            Qt.QListWidgetItem(self.gesture_relations[ac.GESTURE_2]))
-
-        self.gesture_list_widget.addItem(
-            Qt.QListWidgetItem(self.gesture_relations[ac.GESTURE_3]))
+        for gesture_name in self.gesture_relations.values():
+            self.gesture_list_widget.addItem(Qt.QListWidgetItem(gesture_name))
 
         self.add_context_menu_actions()
 
@@ -210,6 +301,9 @@ class Window(Qt.QMainWindow):
         self.is_retraining = True
 
     def remove(self):
+        if self.is_retraining_running():
+            return
+
         self.gesture_list_widget_item_count -= 1
         gesture = self.gesture_list_widget.currentItem().text()
 
@@ -217,59 +311,194 @@ class Window(Qt.QMainWindow):
             self.gesture_list_widget.row(
                 self.gesture_list_widget.currentItem()))
 
-        if gesture == self.gesture_relations[ac.GESTURE_1]:
-            self.recognizes_gesture_1 = False
-        if gesture == self.gesture_relations[ac.GESTURE_2]:
-            self.recognizes_gesture_2 = False
-        if gesture == self.gesture_relations[ac.GESTURE_3]:
-            self.recognizes_gesture_3 = False
+        for required_gesture, gesture_name in \
+                list(self.gesture_relations.items()):
+            if gesture == gesture_name:
+                self.recognized_gestures.discard(required_gesture)
+                del self.gesture_relations[required_gesture]
+
+                # otherwise the next add() reuses the identifier and inherits
+                # the trainings data of the removed gesture
+                self.start_retrain_thread(None, required_gesture)
+                break
 
     def on_gesture_1_activity(self):
         self.recognition_l.setText(self.gesture_relations[ac.GESTURE_1])
-        wb.open_new(TAYLOR_SWIFT)
+        self.action_dispatcher.dispatch(ac.GESTURE_1, wb.open_new, TAYLOR_SWIFT)
 
     def on_gesture_2_activity(self):
         self.recognition_l.setText(self.gesture_relations[ac.GESTURE_2])
-        run_external_application = sh.Command("./dummy.py")
-        print(run_external_application(_bg=False))
+        self.action_dispatcher.dispatch(
+            ac.GESTURE_2, self.action_dispatcher.command("./dummy.py"))
 
     def on_gesture_3_activity(self):
         self.recognition_l.setText(self.gesture_relations[ac.GESTURE_3])
         print("System exit requested")
         # sys.exit(0)
 
+    def on_action_finished(self, gesture, output):
+        """
+        prints the output of a finished gesture action
+
+        :param gesture: the gesture the action belongs to
+        :param output: the output of the action
+
+        :return: void
+        """
+
+        if output:
+            print(output)
+
+    def on_action_failed(self, gesture, error):
+        """
+        reports a failed or timed out gesture action in the status bar
+
+        :param gesture: the gesture the action belongs to
+        :param error: the error message
+
+        :return: void
+        """
+
+        self.win.statusBar.showMessage('Action of ' +
+                                       self.gesture_relations.get(gesture,
+                                                                  gesture) +
+                                       ' failed: ' + error)
+
     def get_wiimote_input(self):
-        if self.wm is not None and self.uses_gestures:
-            if self.wm.buttons["A"]:
-                x, y, z = self.wm.accelerometer
-                self.is_pressed = True
-                self.is_classified = False
-                self.gesture_data.append([float(x), float(y), float(z)])
-            elif self.is_pressed and not self.is_classified:
-                if not self.is_retraining:
-                    self.classify()
-                    self.gesture_data.clear()
-                else:
-                    data = self.gesture_data
-
-                    activity = self.gesture_list_widget.currentItem().text()
-
-                    self.classifier.train(None, data, activity)
-
-                    self.is_classified = True
-                    self.is_retraining = False
-                    self.gesture_data.clear()
+        """
+        processes the batch of samples gathered by the WiimoteThread
+
+        :return: void
+        """
+
+        samples = self.sample_buffer.read()
+        self.wiimote_thread.is_notified = False
+
+        if self.wm is None or not self.uses_gestures:
+            return
+
+        for sample in samples:
+            self.process_sample(sample[sb.X], sample[sb.Y], sample[sb.Z],
+                                sample[sb.BUTTON_A] > 0)
+
+    def process_sample(self, x, y, z, button_a):
+        """
+        records accelerometer values while A is held and classifies or
+        retrains once it is released
+
+        :param x: the accelerometer value of the x axis
+        :param y: the accelerometer value of the y axis
+        :param z: the accelerometer value of the z axis
+        :param button_a: whether the A button is pressed
+
+        :return: void
+        """
+
+        if button_a:
+            self.is_pressed = True
+            self.is_classified = False
+            self.gesture_data.append([float(x), float(y), float(z)])
+        elif self.is_pressed and not self.is_classified:
+            if not self.is_retraining:
+                self.classify()
+                self.gesture_data.clear()
+            else:
+                self.start_retraining()
+
+                self.is_classified = True
+                self.is_retraining = False
+                self.gesture_data.clear()
+
+    def start_retraining(self):
+        """
+        hands a snapshot of the recorded gesture data to a RetrainThread;
+        the current classifier stays in use until the new one is fitted
+
+        :return: void
+        """
+
+        if self.is_retraining_running():
+            return
+
+        name = self.gesture_list_widget.currentItem().text()
+        activity = None
+
+        for gesture, gesture_name in self.gesture_relations.items():
+            if gesture_name == name:
+                activity = gesture
+
+        if activity is None:
+            return
+
+        self.start_retrain_thread(list(self.gesture_data), activity)
+
+    def is_retraining_running(self):
+        """
+        reports a RetrainThread which is still running in the status bar
+
+        :return: True if a RetrainThread is running
+        """
+
+        if self.retrain_thread is not None and \
+                self.retrain_thread.isRunning():
+            self.win.statusBar.showMessage('Retraining still in progress!')
+            return True
+
+        return False
+
+    def start_retrain_thread(self, data, activity):
+        """
+        retrains or removes an activity on a copy of the classifier in a
+        RetrainThread; the copy replaces the live one once it is done
+
+        :param data: the recorded accelerometer values or None to remove the
+                     activity
+        :param activity: the identifier of the activity
+
+        :return: void
+        """
+
+        self.retrain_thread = RetrainThread(self.classifier, data, activity)
+        self.retrain_thread.progress_trigger.connect(self.on_retrain_progress)
+        self.retrain_thread.finished_trigger.connect(self.on_retrain_finished)
+        self.retrain_thread.start()
+
+    def on_retrain_progress(self, percent, step):
+        """
+        reports the progress of the RetrainThread in the status bar
+
+        :param percent: the progress in percent
+        :param step: a description of the current step
+
+        :return: void
+        """
+
+        self.win.statusBar.showMessage('Retraining: ' + str(percent) +
+                                       '% (' + step + ')')
+
+    def on_retrain_finished(self, classifier):
+        """
+        swaps the live classifier for the newly fitted one; runs on the
+        Qt thread, so no classification can observe a half trained model
+
+        :param classifier: the newly fitted classifier
+
+        :return: void
+        """
+
+        self.classifier = classifier
 
     def classify(self):
         self.is_classified = True
         gesture = self.classifier.classify(self.gesture_data)
 
-        if ac.GESTURE_1 == gesture and self.recognizes_gesture_1:
-            self.on_gesture_1_activity()
-        elif ac.GESTURE_2 == gesture and self.recognizes_gesture_2:
-            self.on_gesture_2_activity()
-        elif ac.GESTURE_3 == gesture and self.recognizes_gesture_3:
-            self.on_gesture_3_activity()
+        if gesture not in self.recognized_gestures:
+            return
+
+        if gesture in self.gesture_actions:
+            self.gesture_actions[gesture]()
+        else:
+            self.recognition_l.setText(self.gesture_relations[gesture])
 
     def set_gesture_action(self):
         if self.wm is None:
@@ -284,22 +513,19 @@ class Window(Qt.QMainWindow):
             for i in range(0, self.gesture_list_widget.count()):
                 active_gestures.append(self.gesture_list_widget.item(i).text())
 
-            for ges in active_gestures:
-                if ges == self.gesture_relations[ac.GESTURE_1]:
-                    self.recognizes_gesture_1 = True
-                if ges == self.gesture_relations[ac.GESTURE_2]:
-                    self.recognizes_gesture_2 = True
-                if ges == self.gesture_relations[ac.GESTURE_3]:
-                    self.recognizes_gesture_3 = True
+            for required_gesture, gesture_name in \
+                    self.gesture_relations.items():
+                if gesture_name in active_gestures:
+                    self.recognized_gestures.add(required_gesture)
 
             self.action_btn.setText('No Gesture Mode')
         else:
             self.uses_gestures = False
             self.action_btn.setText('Gesture Mode')
+            self.win.statusBar.showMessage(
+                'Sampling: ' + str(self.wiimote_thread.scheduler))
 
-            self.recognizes_gesture_1 = False
-            self.recognizes_gesture_2 = False
-            self.recognizes_gesture_3 = False
+            self.recognized_gestures.clear()
 
     def show_readme(self):
         msg = Qt.QMessageBox()
@@ -312,8 +538,18 @@ class Window(Qt.QMainWindow):
 
 
 def main():
+    """
+    application entry point; pass --dtw to classify via dynamic time warping
+
+    :return: void
+    """
+
     app = Qt.QApplication(sys.argv)
-    win = Window()
+
+    if '--dtw' in sys.argv[1:]:
+        win = Window(dc.DTWClassifier)
+    else:
+        win = Window()
 
     sys.exit(app.exec_())
 
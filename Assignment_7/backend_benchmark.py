@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# -*- coding: utf-8 -*-
+
+"""
+compares the per gesture prediction latency and accuracy of the classifier
+backends (see classifier_backends.py) against the svc backend
+
+the windows and folds are the same as in classifier_evaluation.py; the runs
+are sequential so the latencies are not distorted by concurrent fits.
+
+usage: ./backend_benchmark.py [--data data.csv] [--window-size 100]
+"""
+
+import argparse
+import time
+import numpy as np
+import activity_classifier as ac
+import classifier_backends as cb
+import classifier_evaluation as ce
+
+
+def benchmark(backend, samples, window_size, k):
+    """
+    cross-validates a backend and measures every single prediction
+
+    :param backend: the identifier of the backend
+    :param samples: a dict mapping activity identifiers to their accelerometer
+                    values
+    :param window_size: the amount of samples per classified gesture
+    :param k: the amount of folds
+
+    :return: a dict mapping each activity identifier to a tuple of accuracy,
+             mean latency in ms and 95th percentile latency in ms
+    """
+
+    splits = {activity: list(ce.folds(ce.split_windows(data, window_size), k))
+              for activity, data in samples.items()}
+
+    correct = {activity: 0 for activity in samples}
+    latencies = {activity: [] for activity in samples}
+
+    for fold in range(k):
+        trainings_data = {activity: split[fold][0]
+                          for activity, split in splits.items()}
+
+        classifier = ac.Classifier(train_data=trainings_data, n_jobs=1,
+                                   backend=backend)
+
+        for activity, split in splits.items():
+            for window in split[fold][1]:
+                start = time.perf_counter()
+                prediction = classifier.classify(window)
+                latencies[activity].append(time.perf_counter() - start)
+
+                correct[activity] += prediction == activity
+
+    results = {}
+
+    for activity, times in latencies.items():
+        if len(times) == 0:
+            continue
+
+        times = np.array(times) * 1000
+
+        results[activity] = (correct[activity] / len(times),
+                             float(np.mean(times)),
+                             float(np.percentile(times, 95)))
+
+    return results
+
+
+def print_results(results):
+    """
+    prints a table of the benchmark results; the speedup is the mean latency
+    of the svc backend divided by the mean latency of the backend
+
+    :param results: a dict mapping backend identifiers to the results of
+                    benchmark()
+
+    :return: void
+    """
+
+    print('backend;activity;accuracy;mean_latency_ms;p95_latency_ms;'
+          'speedup_vs_svc')
+
+    for backend, activities in results.items():
+        for activity, (accuracy, mean, p95) in activities.items():
+            speedup = results[cb.SVC][activity][1] / mean \
+                if cb.SVC in results and mean > 0 else float('nan')
+
+            print(';'.join([backend, activity, '%.3f' % accuracy,
+                            '%.3f' % mean, '%.3f' % p95, '%.2f' % speedup]))
+
+
+def main():
+    """
+    application entry point
+
+    :return: void
+    """
+
+    parser = argparse.ArgumentParser(
+        description='compares the classifier backends on the trainings data')
+
+    parser.add_argument('--data', default=ce.DEFAULT_TRAININGS_DATA_FILE)
+    parser.add_argument('--window-size', type=int, default=100)
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--backends', nargs='+',
+                        default=list(cb.BACKENDS.keys()),
+                        choices=list(cb.BACKENDS.keys()))
+
+    args = parser.parse_args()
+
+    samples = ce.load_samples(args.data)
+
+    results = {backend: benchmark(backend, samples, args.window_size,
+                                  args.folds)
+               for backend in args.backends}
+
+    print_results(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+from sklearn import svm
+from sklearn.multiclass import OneVsOneClassifier
+from sklearn.neighbors import NearestCentroid, KNeighborsClassifier
+from sklearn.linear_model import LogisticRegression
+
+"""
+global identifier variables
+"""
+
+SVC = 'svc'
+NEAREST_CENTROID = 'nearest_centroid'
+LINEAR = 'linear'
+KNN = 'knn'
+
+
+class Backend:
+    """
+    base class of the models activity_classifier.Classifier can predict with
+
+    subclasses create the wrapped model in create_model()
+    """
+
+    def __init__(self, n_jobs=-1, params=None):
+        """
+        constructor
+
+        :param n_jobs: the amount of cores a backend may use for fitting
+        :param params: optional keyword arguments for the wrapped model
+
+        :return: void
+        """
+
+        self.model = self.create_model(n_jobs, params or {})
+
+    def create_model(self, n_jobs, params):
+        """
+        creates the wrapped model
+
+        :param n_jobs: the amount of cores a backend may use for fitting
+        :param params: keyword arguments for the wrapped model
+
+        :return: the model
+        """
+
+        raise NotImplementedError
+
+    def fit(self, data, classes):
+        """
+        fits the model
+
+        :param data: an array of shape (n, features)
+        :param classes: the activity identifier of each row of data
+
+        :return: void
+        """
+
+        self.model.fit(data, classes)
+
+    def predict(self, data):
+        """
+        predicts the activity of each row of data
+
+        :param data: an array of shape (n, features)
+
+        :return: an array of activity identifiers
+        """
+
+        return self.model.predict(data)
+
+
+class SVCBackend(Backend):
+    """
+    support vector machines for each pair of activities, fitted in parallel;
+    the prediction cost grows with the amount of support vectors
+    """
+
+    def create_model(self, n_jobs, params):
+        return OneVsOneClassifier(svm.SVC(**params), n_jobs=n_jobs)
+
+
+class NearestCentroidBackend(Backend):
+    """
+    compares a sample with one centroid per activity
+    """
+
+    def create_model(self, n_jobs, params):
+        return NearestCentroid(**params)
+
+
+class LinearBackend(Backend):
+    """
+    multinomial logistic regression; one weight vector per activity
+    """
+
+    def create_model(self, n_jobs, params):
+        return LogisticRegression(**params)
+
+
+class KNNBackend(Backend):
+    """
+    k nearest neighbours looked up in a KD-tree
+    """
+
+    def create_model(self, n_jobs, params):
+        params = dict({'n_neighbors': 5}, **params)
+
+        return KNeighborsClassifier(algorithm='kd_tree', **params)
+
+
+BACKENDS = {
+    SVC: SVCBackend,
+    NEAREST_CENTROID: NearestCentroidBackend,
+    LINEAR: LinearBackend,
+    KNN: KNNBackend
+}
+
+
+def create_backend(name, n_jobs=-1, params=None):
+    """
+    creates a backend by its identifier
+
+    :param name: one of the keys of BACKENDS
+    :param n_jobs: the amount of cores a backend may use for fitting
+    :param params: optional keyword arguments for the wrapped model
+
+    :return: the backend
+    """
+
+    if name not in BACKENDS:
+        raise Exception("Unknown backend '" + str(name) + "'! Available: " +
+                        ', '.join(BACKENDS.keys()))
+
+    return BACKENDS[name](n_jobs, params)
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# -*- coding: utf-8 -*-
+
+"""
+k-fold cross-validation and hyperparameter sweep for activity_classifier.py
+
+every recording of the trainings data is cut into windows of window_size
+samples (the length of a gesture performed while holding A). the windows of
+each activity are split into k contiguous folds; each fold is classified by a
+classifier trained on the remaining windows.
+
+usage: ./classifier_evaluation.py --window-sizes 50 100 --kernels rbf linear
+       ./classifier_evaluation.py --backends svc knn nearest_centroid
+"""
+
+import argparse
+import concurrent.futures as cf
+import itertools as it
+import pickle
+import time
+import numpy as np
+import activity_classifier as ac
+import classifier_backends as cb
+
+DEFAULT_TRAININGS_DATA_FILE = 'data.csv'
+DEFAULT_REPORT_FILE = 'evaluation_report.csv'
+
+REPORT_COLUMNS = ['rank', 'window_size', 'fft_length', 'backend', 'kernel',
+                  'C', 'gamma', 'accuracy', 'fit_time_s',
+                  'predict_latency_ms', 'model_size_bytes']
+
+
+def load_samples(file):
+    """
+    reads the accelerometer values of each activity of a csv file
+
+    :param file: the csv file to read
+
+    :return: a dict mapping activity identifiers to arrays of shape (n, 3)
+    """
+
+    recordings = ac.TrainingsDataReader.get_recordings(file)
+
+    return {ac.gesture_identifier(a_id):
+            ac.TrainingsDataReader.get_samples(records)
+            for a_id, records in recordings.items()}
+
+
+def split_windows(samples, window_size):
+    """
+    cuts a recording into non-overlapping windows; the remainder is dropped
+
+    :param samples: an array of shape (n, 3)
+    :param window_size: the amount of samples per window
+
+    :return: an array of shape (n // window_size, window_size, 3)
+    """
+
+    count = len(samples) // window_size
+
+    return samples[:count * window_size].reshape(count, window_size, 3)
+
+
+def folds(windows, k):
+    """
+    generates k train/test splits of contiguous blocks of windows
+
+    :param windows: the windows of one activity
+    :param k: the amount of folds
+
+    :return: a generator of (train samples, test windows) tuples; the train
+             samples are the remaining windows joined into one recording
+    """
+
+    blocks = np.array_split(np.arange(len(windows)), k)
+
+    for block in blocks:
+        train = np.delete(windows, block, axis=0)
+
+        yield train.reshape(-1, 3), windows[block]
+
+
+def parse_gamma(value):
+    """
+    converts a gamma command line value into the type expected by the svc
+    backend
+
+    :param value: 'scale', 'auto' or a number
+
+    :return: the string or float
+    """
+
+    if value in ('scale', 'auto'):
+        return value
+
+    return float(value)
+
+
+def evaluate(config, samples, k):
+    """
+    cross-validates one configuration; runs in a worker process
+
+    :param config: a dict containing window_size, fft_length, backend and for
+                   the svc backend kernel, C and gamma
+    :param samples: a dict mapping activity identifiers to their accelerometer
+                    values
+    :param k: the amount of folds
+
+    :return: the config extended by the measured accuracy, the mean fit time,
+             the mean predict latency per window and the pickled model size
+    """
+
+    windows = {activity: split_windows(data, config['window_size'])
+               for activity, data in samples.items()}
+
+    splits = {activity: list(folds(w, k)) for activity, w in windows.items()}
+
+    backend_params = None
+
+    if config['backend'] == cb.SVC:
+        backend_params = {'kernel': config['kernel'], 'C': config['C'],
+                          'gamma': config['gamma']}
+
+    correct = 0
+    total = 0
+    fit_times = []
+    latencies = []
+    model_size = 0
+
+    for fold in range(k):
+        trainings_data = {activity: split[fold][0]
+                          for activity, split in splits.items()}
+
+        start = time.perf_counter()
+        classifier = ac.Classifier(train_data=trainings_data, n_jobs=1,
+                                   backend=config['backend'],
+                                   backend_params=backend_params,
+                                   fft_length=config['fft_length'])
+        fit_times.append(time.perf_counter() - start)
+
+        model_size = max(model_size, len(pickle.dumps(classifier)))
+
+        for activity, split in splits.items():
+            for window in split[fold][1]:
+                start = time.perf_counter()
+                prediction = classifier.classify(window)
+                latencies.append(time.perf_counter() - start)
+
+                correct += prediction == activity
+                total += 1
+
+    result = dict(config)
+    result['accuracy'] = correct / total if total > 0 else 0.0
+    result['fit_time_s'] = float(np.mean(fit_times))
+    result['predict_latency_ms'] = float(np.mean(latencies)) * 1000 \
+        if len(latencies) > 0 else 0.0
+    result['model_size_bytes'] = model_size
+
+    return result
+
+
+def rank(results):
+    """
+    sorts results by accuracy (descending), then fit time, predict latency
+    and model size (ascending)
+
+    :param results: a list of result dicts of evaluate()
+
+    :return: the sorted list
+    """
+
+    return sorted(results, key=lambda r: (-r['accuracy'], r['fit_time_s'],
+                                          r['predict_latency_ms'],
+                                          r['model_size_bytes']))
+
+
+def write_report(results, file):
+    """
+    writes the ranked results to a semicolon separated csv file
+
+    :param results: the ranked list of result dicts
+    :param file: the path of the report
+
+    :return: void
+    """
+
+    with open(file, 'w', newline='') as report:
+        report.write(';'.join(REPORT_COLUMNS) + '\n')
+
+        for i, result in enumerate(results):
+            row = dict(result, rank=i + 1)
+            report.write(';'.join(str(row[c]) for c in REPORT_COLUMNS) + '\n')
+
+
+def parse_args():
+    """
+    parses the command line arguments
+
+    :return: the parsed arguments
+    """
+
+    parser = argparse.ArgumentParser(
+        description='cross-validates the activity classifier over a grid of '
+                    'feature and model settings')
+
+    parser.add_argument('--data', default=DEFAULT_TRAININGS_DATA_FILE)
+    parser.add_argument('--report', default=DEFAULT_REPORT_FILE)
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='size of the process pool (default: all cores)')
+    parser.add_argument('--window-sizes', type=int, nargs='+',
+                        default=[50, 100])
+    parser.add_argument('--fft-lengths', type=int, nargs='+', default=[0],
+                        help='0 transforms the whole trainings recording')
+    parser.add_argument('--backends', nargs='+', default=[cb.SVC],
+                        choices=list(cb.BACKENDS.keys()))
+    parser.add_argument('--kernels', nargs='+', default=['rbf'],
+                        help='only used by the svc backend')
+    parser.add_argument('--C', type=float, nargs='+', default=[1.0])
+    parser.add_argument('--gamma', type=parse_gamma, nargs='+',
+                        default=['scale'])
+
+    return parser.parse_args()
+
+
+def main():
+    """
+    application entry point
+
+    :return: void
+    """
+
+    args = parse_args()
+
+    samples = load_samples(args.data)
+
+    configs = []
+
+    for window_size, fft_length, backend in \
+            it.product(args.window_sizes, args.fft_lengths, args.backends):
+        config = {'window_size': window_size,
+                  'fft_length': fft_length if fft_length > 0 else None,
+                  'backend': backend, 'kernel': '-', 'C': '-', 'gamma': '-'}
+
+        if backend != cb.SVC:
+            configs.append(config)
+            continue
+
+        for kernel, c, gamma in it.product(args.kernels, args.C, args.gamma):
+            configs.append(dict(config, kernel=kernel, C=c, gamma=gamma))
+
+    results = []
+
+    with cf.ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(evaluate, config, samples, args.folds)
+                   for config in configs]
+
+        for i, future in enumerate(cf.as_completed(futures)):
+            results.append(future.result())
+            print('evaluated ' + str(i + 1) + '/' + str(len(configs)))
+
+    results = rank(results)
+    write_report(results, args.report)
+
+    print('best: ' + str(results[0]))
+    print('report written to ' + args.report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,297 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+import activity_classifier as ac
+
+"""
+Dynamic time warping template classifier for 3-axis accelerometer gestures.
+
+Every gesture is resampled to a fixed amount of frames and compared against
+the templates of each activity (1-nearest-neighbour). The warping path is
+restricted to a Sakoe-Chiba band; templates are visited in order of their
+LB_Keogh lower bound and skipped once the bound exceeds the best distance so
+far, and a running DTW is abandoned as soon as a whole row of the cost matrix
+exceeds it.
+
+Based on:
+
+Rakthanmanon, T., et al. (2012). Searching and mining trillions of time
+series subsequences under dynamic time warping. In Proceedings of the 18th
+ACM SIGKDD (pp. 262-270). ACM.
+"""
+
+
+class DTWClassifier:
+    """
+    class responsible for classifying activities via dynamic time warping;
+    offers the same interface as activity_classifier.Classifier
+    """
+
+    MIN_SAMPLES = 30
+
+    def __init__(self, file_path=None, train_data=None, activity=None,
+                 length=64, band=0.1, template_size=50):
+        """
+        constructor
+
+        :param file_path: a potential path to a input csv file
+        :param train_data: a potential array of accelerometer values or a dict
+                           mapping activity identifiers to such arrays
+        :param activity: a potential name of an activity
+        :param length: the amount of frames every gesture is resampled to
+        :param band: the width of the Sakoe-Chiba band relative to length
+        :param template_size: the amount of samples per template; longer
+                              trainings recordings are cut into several
+
+        :return: void
+        """
+
+        if file_path is None and train_data is None:
+            print("Classifier has no trainings data!\nNeeds csv file or array!")
+            exit(0)
+        else:
+            self.length = length
+            self.radius = max(1, int(round(band * length)))
+            self.template_size = template_size
+
+            self.templates = {}
+
+            self.template_activities = []
+            self.template_series = np.empty((0, length, 3))
+            self.upper_envelopes = np.empty((0, length, 3))
+            self.lower_envelopes = np.empty((0, length, 3))
+
+            self.train(file_path, train_data, activity)
+
+    def __resample_(self, data):
+        """
+        centres accelerometer values around the level value and linearly
+        resamples them to self.length frames
+
+        :param data: accelerometer values of shape (n, 3)
+
+        :return: an array of shape (self.length, 3)
+        """
+
+        data = np.asarray(data, dtype=float) - 512
+        src = np.linspace(0, 1, len(data))
+        dst = np.linspace(0, 1, self.length)
+
+        return np.column_stack([np.interp(dst, src, data[:, axis])
+                                for axis in range(3)])
+
+    def __envelope_(self, series):
+        """
+        computes the LB_Keogh envelope of a series within the band radius
+
+        :param series: an array of shape (self.length, 3)
+
+        :return: the upper and lower envelope, both of shape (self.length, 3)
+        """
+
+        padded = np.pad(series, ((self.radius, self.radius), (0, 0)),
+                        mode='edge')
+        windows = sliding_window_view(padded, 2 * self.radius + 1, axis=0)
+
+        return windows.max(axis=-1), windows.min(axis=-1)
+
+    def __rebuild_index_(self):
+        """
+        stacks all templates and their envelopes for vectorized lower bounds
+
+        :return: void
+        """
+
+        self.template_activities = []
+        series = []
+
+        for activity, templates in self.templates.items():
+            self.template_activities += [activity] * len(templates)
+            series += templates
+
+        if len(series) == 0:
+            self.template_series = np.empty((0, self.length, 3))
+            self.upper_envelopes = np.empty((0, self.length, 3))
+            self.lower_envelopes = np.empty((0, self.length, 3))
+            return
+
+        self.template_series = np.array(series)
+
+        envelopes = [self.__envelope_(s) for s in series]
+        self.upper_envelopes = np.array([e[0] for e in envelopes])
+        self.lower_envelopes = np.array([e[1] for e in envelopes])
+
+    def __lb_keogh_(self, query):
+        """
+        computes the LB_Keogh lower bound of the query to every template
+
+        :param query: an array of shape (self.length, 3)
+
+        :return: an array containing one lower bound per template
+        """
+
+        above = np.maximum(query - self.upper_envelopes, 0)
+        below = np.maximum(self.lower_envelopes - query, 0)
+
+        return np.sum(above ** 2 + below ** 2, axis=(1, 2))
+
+    def __dtw_(self, query, template, best):
+        """
+        computes the banded DTW distance (sum of squared distances along the
+        warping path) and abandons early once it cannot beat best
+
+        :param query: an array of shape (self.length, 3)
+        :param template: an array of shape (self.length, 3)
+        :param best: the best distance found so far
+
+        :return: the distance or infinity if abandoned
+        """
+
+        n = self.length
+        r = self.radius
+        cost = np.sum((query[:, None, :] - template[None, :, :]) ** 2,
+                      axis=2).tolist()
+
+        inf = float('inf')
+        previous = [inf] * (n + 1)
+        previous[0] = 0.0
+
+        for i in range(1, n + 1):
+            current = [inf] * (n + 1)
+            row = cost[i - 1]
+            row_min = inf
+
+            for j in range(max(1, i - r), min(n, i + r) + 1):
+                value = row[j - 1] + min(previous[j], previous[j - 1],
+                                         current[j - 1])
+                current[j] = value
+
+                if value < row_min:
+                    row_min = value
+
+            if row_min >= best:
+                return inf
+
+            previous = current
+
+        return previous[n]
+
+    def __split_templates_(self, data):
+        """
+        cuts a trainings recording into templates of self.template_size
+        samples; a recording shorter than two templates is used as a whole
+
+        :param data: accelerometer values of shape (n, 3)
+
+        :return: a list of resampled templates
+        """
+
+        data = np.asarray(data, dtype=float)
+        count = len(data) // self.template_size
+
+        if count < 2:
+            return [self.__resample_(data)]
+
+        return [self.__resample_(data[i * self.template_size:
+                                      (i + 1) * self.template_size])
+                for i in range(count)]
+
+    def __train_activity_(self, data, activity, needs_rebuild=True):
+        """
+        trains a given activity by replacing its templates
+
+        :param data: the new trainings data for the activity
+        :param activity: the identifier of the activity
+        :param needs_rebuild: an optional boolean depicting the necessity to
+               rebuild the stacked templates
+
+        :return: void
+        """
+
+        self.templates[activity] = self.__split_templates_(data)
+
+        if needs_rebuild:
+            self.__rebuild_index_()
+
+    def train(self, file_path, train_data, activity):
+        """
+        trains the classifier based on a csv file or separate activities based
+        on given trainings data and the activity's name
+
+        :param file_path: a path to a csv file
+        :param train_data: a list of accelerometer values which are used for
+                           training or a dict mapping activity identifiers to
+                           such lists
+        :param activity: the name of the activity
+
+        :return: void
+        """
+
+        if file_path is not None and train_data is None:
+            recordings = ac.TrainingsDataReader.get_recordings(file_path)
+            train_data = {
+                ac.gesture_identifier(a_id):
+                    ac.TrainingsDataReader.get_samples(records)
+                for a_id, records in recordings.items()}
+
+        if isinstance(train_data, dict):
+            for name, data in train_data.items():
+                self.__train_activity_(data, name, False)
+
+            self.__rebuild_index_()
+        elif train_data is not None and activity is not None:
+            self.__train_activity_(train_data, activity)
+
+        return self
+
+    def remove(self, activity):
+        """
+        removes an activity and its templates from the classifier
+
+        :param activity: the identifier of the activity
+
+        :return: void
+        """
+
+        if self.templates.pop(activity, None) is not None:
+            self.__rebuild_index_()
+
+    def activities(self):
+        """
+        returns the identifiers of all trained activities
+
+        :return: a list of activity identifiers
+        """
+
+        return list(self.templates.keys())
+
+    def classify(self, gesture_data):
+        """
+        classifies an action based on the given gesture data; the activity of
+        the nearest template wins
+
+        :param gesture_data: the data to be classified
+
+        :return: the identifier of the classified activity
+        """
+
+        if len(gesture_data) < self.MIN_SAMPLES or \
+                len(self.template_activities) == 0:
+            return ac.NOTHING
+
+        query = self.__resample_(gesture_data)
+        lower_bounds = self.__lb_keogh_(query)
+
+        best = float('inf')
+        best_activity = ac.NOTHING
+
+        for idx in np.argsort(lower_bounds):
+            if lower_bounds[idx] >= best:
+                break
+
+            distance = self.__dtw_(query, self.template_series[idx], best)
+
+            if distance < best:
+                best = distance
+                best_activity = self.template_activities[idx]
+
+        return best_activity
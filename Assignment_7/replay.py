@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# -*- coding: utf-8 -*-
+
+"""
+replays recorded trainings_data_logger.py csv files through the data path of
+activity_recognizer.Window without a wiimote and reports the latency from the
+release of A to the classification and to the completed action per gesture
+
+every recording (a_id) is replayed as gestures of --gesture-size samples
+while A is held, followed by a release. the samples are pushed into the
+window's SampleRingBuffer at the pace of their timestamps divided by --speed
+(0 replays as fast as possible) and drained by Window.get_wiimote_input in
+the batches the WiimoteThread would hand over.
+
+usage: ./replay.py data.csv --speed 10 --headless --dry-actions
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, 'common'))  # shared modules
+
+
+def parse_args():
+    """
+    parses the command line arguments
+
+    :return: the parsed arguments
+    """
+
+    parser = argparse.ArgumentParser(
+        description='replays recorded accelerometer data through the '
+                    'activity recognizer')
+
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='replay speed factor; 0 replays without pauses')
+    parser.add_argument('--gesture-size', type=int, default=100,
+                        help='samples per gesture; 0 replays each recording '
+                             'as one gesture')
+    parser.add_argument('--batch-size', type=int, default=5)
+    parser.add_argument('--action-timeout', type=float, default=5.0)
+    parser.add_argument('--dtw', action='store_true',
+                        help='classify via dynamic time warping')
+    parser.add_argument('--headless', action='store_true',
+                        help='use the offscreen Qt platform (CI)')
+    parser.add_argument('--dry-actions', action='store_true',
+                        help='dispatch no-op actions instead of opening the '
+                             'browser or running dummy.py')
+    parser.add_argument('--min-accuracy', type=float, default=0.0,
+                        help='exit with 1 if the accuracy is lower')
+
+    return parser.parse_args()
+
+
+class Replay:
+    """
+    feeds recorded samples into a Window and measures the latencies
+    """
+
+    def __init__(self, app, window, speed, batch_size, action_timeout):
+        """
+        constructor
+
+        :param app: the QApplication
+        :param window: the activity_recognizer.Window
+        :param speed: the replay speed factor (0: no pauses)
+        :param batch_size: the amount of samples drained at once
+        :param action_timeout: the time in seconds to wait for an action
+
+        :return: void
+        """
+
+        self.app = app
+        self.window = window
+        self.speed = speed
+        self.batch_size = batch_size
+        self.action_timeout = action_timeout
+
+        self.classified = None
+        self.classified_at = None
+        self.action_done_at = None
+        self.dispatched = False
+
+        self.results = []
+
+        original_classify = window.classifier.classify
+
+        def classify(gesture_data):
+            self.classified = original_classify(gesture_data)
+            self.classified_at = time.perf_counter()
+
+            return self.classified
+
+        # the window resolves self.classifier.classify at call time
+        window.classifier.classify = classify
+
+        dispatch = window.action_dispatcher.dispatch
+
+        def dispatch_and_record(gesture, action, *args):
+            is_scheduled = dispatch(gesture, action, *args)
+            self.dispatched = self.dispatched or is_scheduled
+
+            return is_scheduled
+
+        # only gestures whose handler schedules an action are waited for;
+        # e.g. the handler of GESTURE_3 dispatches nothing
+        window.action_dispatcher.dispatch = dispatch_and_record
+
+        window.action_dispatcher.min_interval = 0
+        window.action_dispatcher.finished_trigger.connect(self.on_action_done)
+        window.action_dispatcher.failed_trigger.connect(self.on_action_done)
+
+    def on_action_done(self, gesture, output):
+        """
+        records the time an action finished or failed
+
+        :param gesture: the gesture the action belongs to
+        :param output: the output or error message
+
+        :return: void
+        """
+
+        self.action_done_at = time.perf_counter()
+
+    def play(self, samples, timestamps, expected):
+        """
+        replays one gesture and waits for its classification and action
+
+        :param samples: accelerometer values of shape (n, 3)
+        :param timestamps: the recorded timestamps of the samples
+        :param expected: the gesture identifier of the recording
+
+        :return: void
+        """
+
+        buffer = self.window.sample_buffer
+        start = time.perf_counter()
+
+        self.classified = None
+        self.classified_at = None
+        self.action_done_at = None
+        self.dispatched = False
+
+        for i in range(len(samples)):
+            if self.speed > 0:
+                delay = (timestamps[i] - timestamps[0]) / self.speed - \
+                        (time.perf_counter() - start)
+
+                if delay > 0:
+                    time.sleep(delay)
+
+            buffer.push(samples[i][0], samples[i][1], samples[i][2], True,
+                        timestamps[i])
+
+            if buffer.available() >= self.batch_size:
+                self.window.get_wiimote_input()
+                self.app.processEvents()
+
+        buffer.push(samples[-1][0], samples[-1][1], samples[-1][2], False,
+                    timestamps[-1])
+
+        released_at = time.perf_counter()
+        self.window.get_wiimote_input()
+
+        deadline = released_at + self.action_timeout
+
+        while self.dispatched and self.action_done_at is None and \
+                time.perf_counter() < deadline:
+            self.app.processEvents()
+            time.sleep(0.001)
+
+        self.results.append({
+            'expected': expected,
+            'classified': self.classified,
+            'classification_ms': (self.classified_at - released_at) * 1000
+            if self.classified_at is not None else float('nan'),
+            'action_ms': (self.action_done_at - released_at) * 1000
+            if self.action_done_at is not None else float('nan')
+        })
+
+    def report(self):
+        """
+        prints the accuracy and latencies per expected gesture
+
+        :return: the overall accuracy
+        """
+
+        print('gesture;count;accuracy;classification_mean_ms;'
+              'classification_p95_ms;action_mean_ms;action_p95_ms')
+
+        for gesture in sorted(set(r['expected'] for r in self.results)):
+            results = [r for r in self.results if r['expected'] == gesture]
+
+            accuracy = np.mean([r['classified'] == gesture for r in results])
+            classification = np.array([r['classification_ms']
+                                       for r in results])
+            action = np.array([r['action_ms'] for r in results])
+            action = action[~np.isnan(action)]
+
+            print(';'.join([
+                gesture, str(len(results)), '%.3f' % accuracy,
+                '%.3f' % np.nanmean(classification),
+                '%.3f' % np.nanpercentile(classification, 95),
+                '%.3f' % np.mean(action) if len(action) > 0 else '-',
+                '%.3f' % np.percentile(action, 95) if len(action) > 0
+                else '-']))
+
+        if len(self.results) == 0:
+            return 0.0
+
+        return float(np.mean([r['classified'] == r['expected']
+                              for r in self.results]))
+
+
+def main():
+    """
+    application entry point
+
+    :return: void
+    """
+
+    args = parse_args()
+
+    if args.headless:
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    # the replay never talks to a device, so no WIIMOTE_SIM is needed
+    import wiimote_sim
+    wiimote_sim.install()
+
+    from PyQt5 import Qt
+    import activity_recognizer as ar
+    import activity_classifier as ac
+    import dtw_classifier as dc
+    import action_dispatcher as ad
+
+    app = Qt.QApplication(sys.argv[:1])
+
+    if args.dtw:
+        window = ar.Window(dc.DTWClassifier)
+    else:
+        window = ar.Window()
+
+    # the replay stands in for the wiimote; the WiimoteThread stays idle
+    window.wm = object()
+    window.set_gesture_action()
+
+    dispatcher = window.action_dispatcher
+
+    if args.dry_actions:
+        def dispatch(gesture, action, *action_args):
+            return ad.ActionDispatcher.dispatch(dispatcher, gesture,
+                                                lambda: None)
+
+        dispatcher.dispatch = dispatch
+
+    replay = Replay(app, window, args.speed, args.batch_size,
+                    args.action_timeout)
+
+    for file in args.files:
+        for a_id, records in ac.TrainingsDataReader.get_recordings(file).items():
+            samples = ac.TrainingsDataReader.get_samples(records)
+            size = args.gesture_size if args.gesture_size > 0 else len(samples)
+
+            for i in range(0, len(samples) - size + 1, size):
+                replay.play(samples[i:i + size],
+                            records['timestamp'][i:i + size],
+                            ac.gesture_identifier(a_id))
+
+    accuracy = replay.report()
+    print('accuracy: %.3f' % accuracy)
+
+    window.wiimote_thread.is_looping = False
+    window.wiimote_thread.wait()
+    dispatcher.shutdown()
+
+    sys.exit(0 if accuracy >= args.min_accuracy else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+import numpy as np
+
+"""
+column indices of a sample
+"""
+
+X = 0
+Y = 1
+Z = 2
+BUTTON_A = 3
+TIMESTAMP = 4
+
+
+class SampleRingBuffer:
+    """
+    preallocated ring buffer handing timestamped wiimote samples from exactly
+    one producer thread to exactly one consumer thread without locking
+
+    the producer only advances write_index after the sample is stored and the
+    consumer only advances read_index; both are plain ints whose assignment is
+    atomic under the GIL. if the consumer falls behind by more than capacity
+    samples the oldest ones are dropped and counted.
+    """
+
+    def __init__(self, capacity=1024):
+        """
+        constructor
+
+        :param capacity: the amount of samples the buffer can hold
+
+        :return: void
+        """
+
+        self.capacity = capacity
+        self.samples = np.zeros((capacity, 5))
+
+        self.write_index = 0
+        self.read_index = 0
+        self.dropped = 0
+
+    def push(self, x, y, z, button_a, timestamp):
+        """
+        stores a sample; must only be called by the producer thread
+
+        :param x: the accelerometer value of the x axis
+        :param y: the accelerometer value of the y axis
+        :param z: the accelerometer value of the z axis
+        :param button_a: whether the A button is pressed
+        :param timestamp: the time the sample was read
+
+        :return: void
+        """
+
+        self.samples[self.write_index % self.capacity] = \
+            (x, y, z, button_a, timestamp)
+        self.write_index += 1
+
+    def available(self):
+        """
+        returns the amount of samples not read yet
+
+        :return: the amount of unread samples
+        """
+
+        return min(self.write_index - self.read_index, self.capacity)
+
+    def read(self):
+        """
+        returns all samples not read yet; must only be called by the
+        consumer thread
+
+        :return: an array of shape (n, 5) with the columns X, Y, Z, BUTTON_A
+                 and TIMESTAMP in the order the samples were pushed
+        """
+
+        end = self.write_index
+        start = self.read_index
+
+        if end - start > self.capacity:
+            self.dropped += end - start - self.capacity
+            start = end - self.capacity
+
+        self.read_index = end
+
+        first = start % self.capacity
+        last = end % self.capacity
+
+        if first < last or start == end:
+            return self.samples[first:last].copy()
+
+        return np.concatenate((self.samples[first:], self.samples[:last]))
@@ -3,13 +3,26 @@
 # -*- coding: utf-8 -*-
 
 from enum import Enum
+import argparse
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, 'common'))  # shared modules
+import wiimote_sim
+wiimote_sim.install_if_requested()  # WIIMOTE_SIM=<signal> simulates it
 import wiimote
-import time
+import numpy as np
+import threading
+import wiimote_events as we
+import trainings_data as td
 
 WM_ADDRESS = "18:2A:7B:F3:F8:F5"  # default address
 
 ACTIVITIES = Enum('ACTIVITIES', 'shake, whip, idle, wiggle, unlock, lock')
 
+CSV = 'csv'
+BINARY = 'bin'
+
 
 class Activity(Enum):
     shake = 1
@@ -20,52 +33,273 @@ class Activity(Enum):
     wiggle = 3
 
 
-def gather_data(activity):
-    wm = wiimote.connect(WM_ADDRESS, None)
-    min_value = 410  # not always applicable
-    level_value = 512
-    max_value = 610  # not always applicable
+class TrainingsDataWriter:
+    """
+    streams samples to a csv or binary file in chunks; only one chunk is
+    kept in memory, no matter how long a session is
+    """
+
+    def __init__(self, file, file_format=CSV, chunk_size=500):
+        """
+        constructor
+
+        :param file: the path of the output file; '-' writes to stdout
+        :param file_format: CSV or BINARY
+        :param chunk_size: the amount of samples buffered before writing
+
+        :return: void
+        """
+
+        self.file_format = file_format
+        self.chunk = np.zeros(chunk_size, dtype=td.BINARY_RECORD_DTYPE)
+        self.count = 0
+        self.written = 0
+
+        if file == '-':
+            self.file = sys.stdout.buffer
+            self.owns_file = False
+        else:
+            self.file = open(file, 'wb')
+            self.owns_file = True
+
+        if file_format == CSV:
+            self.file.write((td.CSV_HEADER + '\n').encode())
+
+    def write(self, a_id, x, y, z, timestamp):
+        """
+        adds a sample to the current chunk and writes the chunk once full
+
+        :param a_id: the activity id
+        :param x: the accelerometer value of the x axis
+        :param y: the accelerometer value of the y axis
+        :param z: the accelerometer value of the z axis
+        :param timestamp: the time the sample was read
+
+        :return: void
+        """
+
+        self.chunk[self.count] = (a_id, x, y, z, timestamp)
+        self.count += 1
+
+        if self.count == len(self.chunk):
+            self.flush()
+
+    def flush(self):
+        """
+        writes the buffered samples to the file
+
+        :return: void
+        """
+
+        samples = self.chunk[:self.count]
+
+        if self.file_format == CSV:
+            np.savetxt(self.file, samples, fmt='%d;%d;%d;%d;%.7f')
+        else:
+            self.file.write(samples.tobytes())
+
+        self.file.flush()
+
+        self.written += self.count
+        self.count = 0
+
+    def close(self):
+        """
+        writes the remaining samples and closes the file
+
+        :return: void
+        """
+
+        self.flush()
+
+        if self.owns_file:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def activity_ids(labels):
+    """
+    numbers the labels of a session; labels named like an Activity keep its
+    value, all others get the next free ids in the given order
+
+    :param labels: the activity labels
+
+    :return: a dict mapping each label to its a_id
+    """
+
+    ids = {label: Activity[label].value for label in labels
+           if label in Activity.__members__}
+
+    next_id = max([a.value for a in Activity] + list(ids.values())) + 1
 
-    data = []
+    for label in labels:
+        if label not in ids:
+            ids[label] = next_id
+            next_id += 1
 
-    is_pressed = False
+    return ids
 
-    while True:
-        if wm.buttons["A"]:
-            x, y, z = wm.accelerometer
 
-            data.append([activity, x, y, z, time.time()])
-            is_pressed = True
-        elif is_pressed:
-            break
+class LoggingSession:
+    """
+    records labelled recordings from the wiimote's reports until Home is
+    pressed; every report arriving while A is held is written, so the rate
+    of the data is the wiimote's report rate
 
-        time.sleep(0.02)
+    hold A: record with the current label
+    Plus/Minus: select the next/previous label
+    Home: end the session
+    """
 
-    return data
+    def __init__(self, events, writer, labels):
+        """
+        constructor; subscribes to the reports of the wiimote
 
+        :param events: the WiimoteEvents of the connected wiimote
+        :param writer: the TrainingsDataWriter
+        :param labels: the activity labels of the session
 
-def list_to_string_for_csv(l):
-    out = ''
+        :return: void
+        """
 
-    for v in l:
-        out += (str(v) + ";")
+        self.events = events
+        self.writer = writer
+        self.labels = labels
 
-    return out[0: len(out) - 1]
+        self.ids = activity_ids(labels)
+        self.label_idx = 0
+
+        self.is_recording = False
+        self.count = 0
+        self.finished = threading.Event()
+
+        self.consumer = events.subscribe(self.on_sample)
+        events.subscribe_buttons(self.on_button)
+
+    def current_id(self):
+        """
+        :return: the a_id of the selected label
+        """
+
+        return self.ids[self.labels[self.label_idx]]
+
+    def on_sample(self, x, y, z, timestamp):
+        """
+        writes an accelerometer report while recording
+
+        :param x: the accelerometer value of the x axis
+        :param y: the accelerometer value of the y axis
+        :param z: the accelerometer value of the z axis
+        :param timestamp: the time the report arrived
+
+        :return: void
+        """
+
+        if self.is_recording:
+            self.writer.write(self.current_id(), x, y, z, timestamp)
+            self.count += 1
+
+    def on_button(self, button, is_pressed, timestamp):
+        """
+        starts and stops recordings, selects labels and ends the session
+
+        :param button: the name of the changed button
+        :param is_pressed: whether the button was pressed or released
+        :param timestamp: the time of the change
+
+        :return: void
+        """
+
+        if button == "A":
+            if is_pressed:
+                self.count = 0
+                self.is_recording = True
+            elif self.is_recording:
+                self.is_recording = False
+                print('recorded ' + str(self.count) + ' samples of ' +
+                      self.labels[self.label_idx] + ' (a_id ' +
+                      str(self.current_id()) + ')', file=sys.stderr)
+        elif not is_pressed or self.is_recording:
+            return
+        elif button == "Home":
+            self.finished.set()
+        elif button in ["Plus", "Minus"]:
+            self.label_idx = (self.label_idx +
+                              (1 if button == "Plus" else -1)) % \
+                len(self.labels)
+            print('label: ' + self.labels[self.label_idx], file=sys.stderr)
+
+    def run(self):
+        """
+        blocks until Home is pressed
+
+        :return: a dict mapping each label to its a_id
+        """
+
+        # stdout may be piped into the csv file
+        print('label: ' + self.labels[self.label_idx], file=sys.stderr)
+
+        self.finished.wait()
+
+        self.events.unsubscribe(self.consumer)
+        self.events.unsubscribe(self.on_button)
+
+        print('reports: %d at %.2f Hz' % (self.events.reports,
+                                         self.events.report_rate()),
+              file=sys.stderr)
+
+        return self.ids
+
+
+def write_labels(ids, file):
+    """
+    writes the a_id of each label next to the output file
+
+    :param ids: a dict mapping each label to its a_id
+    :param file: the path of the label file
+
+    :return: void
+    """
+
+    with open(file, 'w') as label_file:
+        label_file.write('a_id;label\n')
+
+        for label, a_id in sorted(ids.items(), key=lambda i: i[1]):
+            label_file.write(str(a_id) + ';' + label + '\n')
 
 
 def main():
     '''
-    pipe stdout to csv file!
+    records labelled accelerometer data; writes csv to stdout unless an
+    output file is given
     :return:void
     '''
 
-    print('a_id;x_accel;y_accel;z_accel;timestamp')
+    parser = argparse.ArgumentParser(
+        description='records labelled wiimote accelerometer data')
+
+    parser.add_argument('labels', nargs='*', default=['wiggle'])
+    parser.add_argument('-o', '--output', default='-')
+    parser.add_argument('--format', choices=[CSV, BINARY], default=CSV)
+    parser.add_argument('--address', default=WM_ADDRESS)
+
+    args = parser.parse_args()
+
+    if args.format == BINARY and args.output == '-':
+        parser.error('binary output requires --output')
+
+    wm = wiimote.connect(args.address, None)
 
-    data = gather_data(Activity.wiggle.value)
+    with TrainingsDataWriter(args.output, args.format) as writer:
+        ids = LoggingSession(we.WiimoteEvents(wm), writer, args.labels).run()
 
-    for l in data:
-        out = list_to_string_for_csv(l)
-        print(out)
+    if args.output != '-':
+        write_labels(ids, args.output + '.labels')
 
 
 if __name__ == '__main__':
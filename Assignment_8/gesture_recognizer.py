@@ -3,10 +3,13 @@
 # -*- coding: utf-8 -*-
 
 from PyQt5 import uic, QtGui, QtCore, Qt, QtWidgets
+import os
 import sys
-import sh
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, 'common'))  # shared modules
 import webbrowser as wb
 import gesture_classifier as gc
+import action_dispatcher as ad
 import csv
 
 UI_FILE = 'gesture_recognizer.ui'
@@ -217,6 +220,10 @@ class Window(Qt.QMainWindow):
 
         self.gesture_action_relation = {}
 
+        self.action_dispatcher = ad.ActionDispatcher()
+        self.action_dispatcher.finished_trigger.connect(self.on_action_finished)
+        self.action_dispatcher.failed_trigger.connect(self.on_action_failed)
+
         self.add_default_gesture('triangle', 0)
         self.add_default_gesture('circle', 1)
         self.add_default_gesture('caret', 2)
@@ -380,21 +387,65 @@ class Window(Qt.QMainWindow):
             return
 
         if self.gesture_actions[0] == self.gesture_action_relation[gesture]:
-            wb.open('https://www.youtube.com/watch?v=XiBYM6g8Tck')
-            self.notification_l.setText('Playing Macarena in Browser (' +
-                                        gesture + ')')
+            if self.action_dispatcher.dispatch(
+                    gesture, wb.open,
+                    'https://www.youtube.com/watch?v=XiBYM6g8Tck'):
+                self.notification_l.setText('Playing Macarena in Browser (' +
+                                            gesture + ')')
+            else:
+                self.notify_skipped(gesture)
 
         elif self.gesture_actions[1] == self.gesture_action_relation[gesture]:
-            run_external_application = sh.Command("./dummy.py")
-            self.notification_l.setText('Ran dummy.py (' + gesture + ') Look '
-                                        'in the terminal')
-
-            print(run_external_application(_bg=False))
+            if self.action_dispatcher.dispatch(
+                    gesture, self.action_dispatcher.command("./dummy.py")):
+                self.notification_l.setText('Ran dummy.py (' + gesture +
+                                            ') Look in the terminal')
+            else:
+                self.notify_skipped(gesture)
         elif self.gesture_actions[2] == self.gesture_action_relation[gesture]:
             self.notification_l.setText('BYE BYE (' + gesture + ')')
             print('Shutdown requested! BYE BYE')
             sys.exit(0)
 
+    def notify_skipped(self, gesture):
+        """
+        shows that the dispatcher rejected the action of a gesture because it
+        is rate limited or too many actions are pending
+
+        :param gesture: the gesture the action belongs to
+
+        :return: void
+        """
+
+        self.notification_l.setText('Skipped action of ' + gesture +
+                                    ' (rate limited or busy)')
+
+    def on_action_finished(self, gesture, output):
+        """
+        prints the output of a finished gesture action
+
+        :param gesture: the gesture the action belongs to
+        :param output: the output of the action
+
+        :return: void
+        """
+
+        if output:
+            print(output)
+
+    def on_action_failed(self, gesture, error):
+        """
+        shows a failed or timed out gesture action in the notification label
+
+        :param gesture: the gesture the action belongs to
+        :param error: the error message
+
+        :return: void
+        """
+
+        self.notification_l.setText('Action of ' + gesture + ' failed: ' +
+                                    error)
+
 
 def main():
     """
@@ -0,0 +1,115 @@
+from PyQt5 import QtCore
+import concurrent.futures as cf
+import threading
+import time
+import sh
+
+
+class ActionDispatcher(QtCore.QObject):
+    """
+    runs the actions assigned to gestures on a bounded pool of background
+    threads, so a slow action never blocks the Qt thread and with it the
+    gesture recognition
+
+    results are delivered through finished_trigger and failed_trigger, which
+    are emitted from the worker threads and therefore queued to the Qt thread
+    """
+
+    finished_trigger = QtCore.pyqtSignal(str, str)  # gesture, output
+    failed_trigger = QtCore.pyqtSignal(str, str)  # gesture, error message
+
+    def __init__(self, max_workers=2, max_pending=4, timeout=10.0,
+                 min_interval=1.0):
+        """
+        constructor
+
+        :param max_workers: the amount of actions running at the same time
+        :param max_pending: the amount of running and waiting actions; further
+                            dispatches are rejected
+        :param timeout: the time in seconds after which an external command
+                        is killed
+        :param min_interval: the minimum time in seconds between two actions
+                             of the same gesture; earlier ones are rejected
+
+        :return: void
+        """
+
+        super(ActionDispatcher, self).__init__()
+
+        self.executor = cf.ThreadPoolExecutor(max_workers=max_workers)
+        self.slots = threading.BoundedSemaphore(max_pending)
+
+        self.timeout = timeout
+        self.min_interval = min_interval
+        self.last_dispatch = {}
+
+    def dispatch(self, gesture, action, *args):
+        """
+        schedules an action unless the gesture is rate limited or too many
+        actions are pending
+
+        :param gesture: the gesture the action belongs to
+        :param action: a callable; its return value is reported as output
+        :param args: the arguments for the callable
+
+        :return: True if the action was scheduled, False if it was rejected
+        """
+
+        now = time.monotonic()
+        last = self.last_dispatch.get(gesture)
+
+        if last is not None and now - last < self.min_interval:
+            return False
+
+        if not self.slots.acquire(blocking=False):
+            return False
+
+        self.last_dispatch[gesture] = now
+        self.executor.submit(self.__run_, gesture, action, args)
+
+        return True
+
+    def __run_(self, gesture, action, args):
+        """
+        executes an action on a worker thread and reports its outcome
+
+        :param gesture: the gesture the action belongs to
+        :param action: the callable
+        :param args: the arguments for the callable
+
+        :return: void
+        """
+
+        try:
+            output = action(*args)
+            self.finished_trigger.emit(gesture,
+                                       '' if output is None else str(output))
+        except Exception as e:
+            self.failed_trigger.emit(gesture, repr(e))
+        finally:
+            self.slots.release()
+
+    def command(self, path):
+        """
+        creates an action running an external command which is killed after
+        the dispatcher's timeout
+
+        :param path: the path of the executable
+
+        :return: a callable passing its arguments to the command and
+                 returning the command's output
+        """
+
+        run_external_application = sh.Command(path)
+
+        return lambda *args: run_external_application(*args,
+                                                      _timeout=self.timeout)
+
+    def shutdown(self):
+        """
+        stops accepting actions; running actions are not waited for
+
+        :return: void
+        """
+
+        self.executor.shutdown(wait=False)
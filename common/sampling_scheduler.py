@@ -0,0 +1,240 @@
+import asyncio
+import math
+import time
+
+"""
+policies for iterations that start after their deadline
+"""
+
+CATCH_UP = 'catch_up'  # run the missed iterations back to back
+SKIP = 'skip'  # drop the missed iterations and continue with the next one
+
+
+class DeadlineScheduler:
+    """
+    paces a loop to an exact rate by sleeping until absolute deadlines on a
+    monotonic clock instead of sleeping a fixed time after each iteration;
+    the time an iteration takes therefore does not lower the rate
+
+    usage:
+        scheduler = DeadlineScheduler(50)
+
+        while True:
+            scheduler.wait()
+            read_sample()
+    """
+
+    def __init__(self, rate, policy=SKIP, max_catch_up=5,
+                 clock=time.monotonic, sleep=time.sleep):
+        """
+        constructor
+
+        :param rate: the target rate in Hz
+        :param policy: CATCH_UP or SKIP
+        :param max_catch_up: the maximum amount of missed iterations CATCH_UP
+                             runs back to back; older ones are skipped
+        :param clock: a monotonic clock returning seconds
+        :param sleep: a function sleeping the given amount of seconds
+
+        :return: void
+        """
+
+        self.rate = rate
+        self.period = 1.0 / rate
+        self.policy = policy
+        self.max_catch_up = max_catch_up
+
+        self.clock = clock
+        self.sleep = sleep
+
+        self.reset()
+
+    def reset(self):
+        """
+        restarts the schedule with the next call of wait() and clears the
+        statistics
+
+        :return: void
+        """
+
+        self.deadline = None
+        self.first_tick = None
+        self.last_tick = None
+
+        self.ticks = 0
+        self.overruns = 0
+        self.skipped = 0
+
+        # Welford's running mean and variance of the lateness
+        self.lateness_mean = 0.0
+        self.lateness_m2 = 0.0
+        self.lateness_max = 0.0
+
+    def wait(self):
+        """
+        blocks until the next deadline; the first call returns immediately
+        and starts the schedule
+
+        :return: the clock time of the tick
+        """
+
+        remaining = self.__remaining_()
+
+        if remaining > 0:
+            self.sleep(remaining)
+
+        return self.__tick_()
+
+    async def wait_async(self):
+        """
+        waits like wait() but suspends the calling coroutine instead of
+        blocking, so one event loop can pace many schedules
+
+        :return: the clock time of the tick
+        """
+
+        remaining = self.__remaining_()
+
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+
+        return self.__tick_()
+
+    def __remaining_(self):
+        """
+        starts the schedule with the first call
+
+        :return: the time in seconds until the next deadline
+        """
+
+        now = self.clock()
+
+        if self.deadline is None:
+            self.deadline = now
+            self.first_tick = now
+
+        return self.deadline - now
+
+    def __tick_(self):
+        """
+        records a tick and advances the deadline
+
+        :return: the clock time of the tick
+        """
+
+        now = self.clock()
+
+        if now - self.deadline >= self.period:
+            self.overruns += 1
+            self.__handle_overrun_(now)
+
+        self.__record_(now)
+        self.deadline += self.period
+
+        return now
+
+    def delay(self, seconds):
+        """
+        postpones the next deadline, e.g. to pause a loop deliberately,
+        without counting it as an overrun
+
+        :param seconds: the additional time until the next tick
+
+        :return: void
+        """
+
+        if self.deadline is not None:
+            self.deadline += seconds
+
+    def __handle_overrun_(self, now):
+        """
+        moves the deadline of a late tick according to the policy
+
+        :param now: the current clock time
+
+        :return: void
+        """
+
+        missed = int(math.floor((now - self.deadline) / self.period))
+
+        if self.policy == CATCH_UP:
+            missed = max(0, missed - self.max_catch_up)
+
+        self.skipped += missed
+        self.deadline += missed * self.period
+
+    def __record_(self, now):
+        """
+        updates the statistics with a tick
+
+        :param now: the clock time of the tick
+
+        :return: void
+        """
+
+        lateness = max(0.0, now - self.deadline)
+
+        self.ticks += 1
+        self.last_tick = now
+
+        delta = lateness - self.lateness_mean
+        self.lateness_mean += delta / self.ticks
+        self.lateness_m2 += delta * (lateness - self.lateness_mean)
+        self.lateness_max = max(self.lateness_max, lateness)
+
+    def achieved_rate(self):
+        """
+        returns the measured rate since the schedule started
+
+        :return: the rate in Hz or 0 if less than two ticks happened
+        """
+
+        if self.ticks < 2 or self.last_tick == self.first_tick:
+            return 0.0
+
+        return (self.ticks - 1) / (self.last_tick - self.first_tick)
+
+    def jitter(self):
+        """
+        returns the standard deviation of the lateness of the ticks
+
+        :return: the jitter in seconds
+        """
+
+        if self.ticks < 2:
+            return 0.0
+
+        return math.sqrt(self.lateness_m2 / (self.ticks - 1))
+
+    def stats(self):
+        """
+        returns a summary of the schedule's statistics
+
+        :return: a dict containing target_rate, achieved_rate (Hz), ticks,
+                 jitter_ms, mean_lateness_ms, max_lateness_ms, overruns and
+                 skipped
+        """
+
+        return {
+            'target_rate': self.rate,
+            'achieved_rate': self.achieved_rate(),
+            'ticks': self.ticks,
+            'jitter_ms': self.jitter() * 1000,
+            'mean_lateness_ms': self.lateness_mean * 1000,
+            'max_lateness_ms': self.lateness_max * 1000,
+            'overruns': self.overruns,
+            'skipped': self.skipped
+        }
+
+    def __str__(self):
+        """
+        returns a one line summary of the statistics
+
+        :return: the summary
+        """
+
+        return '%.2f/%.2f Hz, jitter %.2f ms, max lateness %.2f ms, ' \
+               '%d overruns, %d skipped' % (self.achieved_rate(), self.rate,
+                                            self.jitter() * 1000,
+                                            self.lateness_max * 1000,
+                                            self.overruns, self.skipped)
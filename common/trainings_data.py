@@ -0,0 +1,100 @@
+import itertools as it
+import numpy as np
+
+"""
+File format of the accelerometer trainings data.
+
+trainings_data_logger.py writes it; activity_classifier.py, analyze_batch.py
+and wiimote_sim.py read it. A csv file has a header line followed by one
+'a_id;x;y;z;timestamp' row per sample. A binary file (*.bin) is a flat
+sequence of BINARY_RECORD_DTYPE records. Both read into RECORD_DTYPE.
+"""
+
+CSV_HEADER = 'a_id;x_accel;y_accel;z_accel;timestamp'
+
+RECORD_DTYPE = np.dtype([('a_id', np.int32),
+                         ('x', np.float64),
+                         ('y', np.float64),
+                         ('z', np.float64),
+                         ('timestamp', np.float64)])
+
+# compact binary layout of trainings_data_logger.py --format bin, 16 bytes
+# per sample
+BINARY_RECORD_DTYPE = np.dtype([('a_id', '<u2'),
+                                ('x', '<i2'),
+                                ('y', '<i2'),
+                                ('z', '<i2'),
+                                ('timestamp', '<f8')])
+
+
+def is_binary(file):
+    """
+    :param file: the path of a trainings data file
+    :return: True if the file was written with --format bin
+    """
+
+    return file.endswith('.bin')
+
+
+def load_csv(lines):
+    """
+    parses csv lines into a structured array of RECORD_DTYPE
+
+    :param lines: an iterable of csv lines without the header
+    :return: the structured array
+    """
+
+    return np.loadtxt(lines, dtype=RECORD_DTYPE, delimiter=';', ndmin=1)
+
+
+def read_records(file):
+    """
+    reads a whole csv or binary file into typed columns in one call
+
+    :param file: the file to read
+    :return: a structured array of RECORD_DTYPE
+    """
+
+    if is_binary(file):
+        return np.fromfile(file, dtype=BINARY_RECORD_DTYPE).astype(
+            RECORD_DTYPE)
+
+    with open(file, "r", newline='') as csvfile:
+        next(csvfile, None)
+
+        return load_csv(csvfile)
+
+
+def iter_chunks(file, chunk_size):
+    """
+    reads a csv or binary file chunk by chunk, so files larger than the
+    memory can be processed
+
+    :param file: the file to read
+    :param chunk_size: the maximum amount of rows read at once
+    :return: a generator of structured arrays of RECORD_DTYPE
+    """
+
+    if is_binary(file):
+        with open(file, "rb") as binfile:
+            while True:
+                chunk = np.fromfile(binfile, dtype=BINARY_RECORD_DTYPE,
+                                    count=chunk_size)
+
+                if len(chunk) == 0:
+                    break
+
+                yield chunk.astype(RECORD_DTYPE)
+
+        return
+
+    with open(file, "r", newline='') as csvfile:
+        next(csvfile, None)
+
+        while True:
+            lines = list(it.islice(csvfile, chunk_size))
+
+            if len(lines) == 0:
+                break
+
+            yield load_csv(lines)
@@ -0,0 +1,305 @@
+import collections
+import threading
+import time
+
+"""
+Event-driven input layer on top of a connected wiimote.
+
+The wiimote module already reads every report on its own thread and offers
+register_callback for the accelerometer and the buttons. WiimoteEvents
+registers once and fans the reports out to any number of consumers, so no
+consumer has to poll the device and no report between two polls is lost.
+
+Consumers either get callbacks on the wiimote's thread or block on a
+ReportQueue in their own thread:
+
+    events = WiimoteEvents(wm)
+    events.subscribe(on_sample, decimation=5, average=True)
+    events.subscribe_buttons(on_button)
+
+    reports = events.queue(decimation=5)
+    x, y, z, timestamp = reports.get()
+"""
+
+
+class Consumer:
+    """
+    forwards every n-th accelerometer report to a callback, optionally the
+    mean of the n reports instead of the last one
+    """
+
+    def __init__(self, callback, decimation=1, average=False):
+        """
+        constructor
+
+        :param callback: a callable taking x, y, z and the timestamp
+        :param decimation: the amount of reports per forwarded report
+        :param average: forwards the mean of the reports if True
+
+        :return: void
+        """
+
+        self.callback = callback
+        self.decimation = max(1, int(decimation))
+        self.average = average
+
+        self.count = 0
+        self.sum = [0.0, 0.0, 0.0]
+
+    def __call__(self, x, y, z, timestamp):
+        """
+        counts a report and forwards it if it completes the decimation
+
+        :param x: the accelerometer value of the x axis
+        :param y: the accelerometer value of the y axis
+        :param z: the accelerometer value of the z axis
+        :param timestamp: the time the report arrived
+
+        :return: void
+        """
+
+        self.count += 1
+
+        if self.average:
+            self.sum[0] += x
+            self.sum[1] += y
+            self.sum[2] += z
+
+        if self.count < self.decimation:
+            return
+
+        if self.average:
+            x, y, z = [v / self.count for v in self.sum]
+            self.sum = [0.0, 0.0, 0.0]
+
+        self.count = 0
+        self.callback(x, y, z, timestamp)
+
+
+class ReportQueue:
+    """
+    bounded queue of accelerometer reports for consumers running in their own
+    thread; when it is full the oldest report is dropped, so a slow consumer
+    always continues with the most recent reports
+    """
+
+    def __init__(self, maxlen=64):
+        """
+        constructor
+
+        :param maxlen: the maximum amount of queued reports
+
+        :return: void
+        """
+
+        self.reports = collections.deque(maxlen=maxlen)
+        self.condition = threading.Condition()
+        self.dropped = 0
+
+        self.consumer = None  # set by WiimoteEvents.queue
+
+    def put(self, x, y, z, timestamp):
+        """
+        queues a report; called on the wiimote's thread
+
+        :param x: the accelerometer value of the x axis
+        :param y: the accelerometer value of the y axis
+        :param z: the accelerometer value of the z axis
+        :param timestamp: the time the report arrived
+
+        :return: void
+        """
+
+        with self.condition:
+            if len(self.reports) == self.reports.maxlen:
+                self.dropped += 1
+
+            self.reports.append((x, y, z, timestamp))
+            self.condition.notify()
+
+    def get(self, timeout=None):
+        """
+        blocks until a report is queued
+
+        :param timeout: the maximum time to wait in seconds or None
+
+        :return: the oldest report (x, y, z, timestamp) or None on timeout
+        """
+
+        with self.condition:
+            if not self.condition.wait_for(lambda: len(self.reports) > 0,
+                                           timeout):
+                return None
+
+            return self.reports.popleft()
+
+    def clear(self):
+        """
+        drops all queued reports, e.g. after a deliberate pause
+
+        :return: void
+        """
+
+        with self.condition:
+            self.reports.clear()
+
+
+class WiimoteEvents:
+    """
+    distributes the accelerometer and button reports of a wiimote to its
+    consumers as they arrive
+    """
+
+    def __init__(self, wm):
+        """
+        constructor; registers the callbacks at the wiimote
+
+        :param wm: the connected wiimote
+
+        :return: void
+        """
+
+        self.wm = wm
+
+        self.consumers = []
+        self.button_consumers = []
+
+        # kept up to date by the button reports, so reading it needs no
+        # request to the device
+        self.pressed = set()
+
+        self.reports = 0
+        self.first_report = None
+        self.last_report = None
+
+        wm.accelerometer.register_callback(self.__on_accelerometer_)
+        wm.buttons.register_callback(self.__on_buttons_)
+
+    def subscribe(self, callback, decimation=1, average=False):
+        """
+        registers a callback for the accelerometer reports; it is called on
+        the wiimote's thread and should return quickly
+
+        :param callback: a callable taking x, y, z and the timestamp
+        :param decimation: the amount of reports per call
+        :param average: passes the mean of the reports if True
+
+        :return: the consumer, which can be passed to unsubscribe
+        """
+
+        consumer = Consumer(callback, decimation, average)
+        self.consumers.append(consumer)
+
+        return consumer
+
+    def unsubscribe(self, consumer):
+        """
+        removes an accelerometer or button consumer
+
+        :param consumer: the value returned by subscribe, queue or
+                         subscribe_buttons
+
+        :return: void
+        """
+
+        if isinstance(consumer, ReportQueue):
+            consumer = consumer.consumer
+
+        if consumer in self.consumers:
+            self.consumers.remove(consumer)
+
+        if consumer in self.button_consumers:
+            self.button_consumers.remove(consumer)
+
+    def queue(self, decimation=1, average=False, maxlen=64):
+        """
+        creates a ReportQueue receiving the accelerometer reports
+
+        :param decimation: the amount of reports per queued report
+        :param average: queues the mean of the reports if True
+        :param maxlen: the maximum amount of queued reports
+
+        :return: the ReportQueue
+        """
+
+        reports = ReportQueue(maxlen)
+        reports.consumer = self.subscribe(reports.put, decimation, average)
+
+        return reports
+
+    def subscribe_buttons(self, callback):
+        """
+        registers a callback for button changes; it is called on the
+        wiimote's thread and should return quickly
+
+        :param callback: a callable taking the button name, whether it is
+                         pressed and the timestamp
+
+        :return: the callback, which can be passed to unsubscribe
+        """
+
+        self.button_consumers.append(callback)
+
+        return callback
+
+    def is_pressed(self, button):
+        """
+        :param button: the name of the button
+        :return: True if the last report of the button was a press
+        """
+
+        return button in self.pressed
+
+    def report_rate(self):
+        """
+        returns the measured accelerometer report rate
+
+        :return: the rate in Hz or 0 if less than two reports arrived
+        """
+
+        if self.reports < 2 or self.last_report == self.first_report:
+            return 0.0
+
+        return (self.reports - 1) / (self.last_report - self.first_report)
+
+    def __on_accelerometer_(self, values):
+        """
+        called by the wiimote for each accelerometer report
+
+        :param values: the accelerometer values [x, y, z]
+
+        :return: void
+        """
+
+        timestamp = time.time()
+
+        if self.first_report is None:
+            self.first_report = timestamp
+
+        self.last_report = timestamp
+        self.reports += 1
+
+        x, y, z = values
+
+        for consumer in list(self.consumers):
+            consumer(x, y, z, timestamp)
+
+    def __on_buttons_(self, changed):
+        """
+        called by the wiimote for each button change
+
+        :param changed: a list of (button name, is pressed) tuples
+
+        :return: void
+        """
+
+        timestamp = time.time()
+
+        for button, is_pressed in changed:
+            if is_pressed:
+                self.pressed.add(button)
+            else:
+                self.pressed.discard(button)
+
+            for callback in list(self.button_consumers):
+                callback(button, is_pressed, timestamp)
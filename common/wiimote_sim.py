@@ -0,0 +1,475 @@
+import math
+import os
+import sys
+import threading
+import time
+import numpy as np
+import trainings_data as td
+
+"""
+Simulated drop-in replacement for the wiimote module.
+
+It offers the surface the assignments use: connect(), accelerometer, buttons
+(both with register_callback), leds and rumble(). A report thread produces
+samples at a configurable rate from deterministic signal generators or
+recorded trainings data traces; every read, LED write and rumble can be
+delayed by an injected latency.
+
+Scripts opt in through environment variables before importing wiimote:
+
+    import wiimote_sim
+    wiimote_sim.install_if_requested()
+    import wiimote
+
+WIIMOTE_SIM          signal spec: sine[:frequency[:amplitude]],
+                     constant[:x:y:z], noise[:sigma[:seed]] or trace:<file>
+WIIMOTE_SIM_RATE     report rate in Hz (default 100)
+WIIMOTE_SIM_LATENCY  latency in seconds injected into reads and writes
+WIIMOTE_SIM_BUTTONS  periodic presses: <button>:<period>:<duration>[,...]
+"""
+
+LEVEL = 512
+BUTTONS = ['A', 'B', 'Down', 'Home', 'Left', 'Minus', 'One', 'Plus', 'Right',
+           'Two', 'Up']
+
+
+class ConstantSignal:
+    """
+    holds the accelerometer at fixed values
+    """
+
+    def __init__(self, x=LEVEL, y=LEVEL, z=LEVEL + 100):
+        self.values = [x, y, z]
+
+    def __call__(self, t):
+        """
+        :param t: the device time in seconds
+        :return: the accelerometer values [x, y, z]
+        """
+
+        return list(self.values)
+
+
+class SineSignal:
+    """
+    tilts the device back and forth; the axes are 120 degrees out of phase
+    """
+
+    def __init__(self, frequency=0.5, amplitude=100, offset=LEVEL):
+        self.frequency = frequency
+        self.amplitude = amplitude
+        self.offset = offset
+
+    def __call__(self, t):
+        """
+        :param t: the device time in seconds
+        :return: the accelerometer values [x, y, z]
+        """
+
+        return [self.offset + self.amplitude *
+                math.sin(2 * math.pi * self.frequency * t + k * 2 * math.pi / 3)
+                for k in range(3)]
+
+
+class NoiseSignal:
+    """
+    adds seeded gaussian noise to another signal; the same seed and report
+    index always yield the same noise
+    """
+
+    def __init__(self, sigma=5.0, seed=0, signal=None):
+        self.sigma = sigma
+        self.seed = seed
+        self.signal = signal or ConstantSignal()
+
+    def __call__(self, t, index=0):
+        """
+        :param t: the device time in seconds
+        :param index: the index of the report
+        :return: the accelerometer values [x, y, z]
+        """
+
+        noise = np.random.RandomState((self.seed, index)).normal(0, self.sigma,
+                                                                 3)
+
+        return [v + n for v, n in zip(self.signal(t), noise)]
+
+
+class TraceSignal:
+    """
+    replays a trainings data csv or binary file in a loop with its recorded
+    timing; A is held during every recording and released for
+    gap seconds between two recordings
+    """
+
+    def __init__(self, file, gap=1.0):
+        """
+        constructor
+
+        :param file: the csv or binary file written by
+                     trainings_data_logger.py
+        :param gap: the time between two recordings in seconds
+
+        :return: void
+        """
+
+        records = td.read_records(file)
+
+        starts = np.flatnonzero(np.diff(records['a_id'])) + 1
+        recordings = np.split(records, starts)
+
+        times = []
+        pressed = []
+        values = []
+        offset = 0.0
+
+        for recording in recordings:
+            t = recording['timestamp'] - recording['timestamp'][0] + offset
+            times.append(t)
+            pressed.append(np.ones(len(t), dtype=bool))
+
+            offset = t[-1] + gap
+            times.append([t[-1] + gap / 2])
+            pressed.append([False])
+
+            xyz = np.column_stack((recording['x'], recording['y'],
+                                   recording['z']))
+            values.append(np.vstack((xyz, xyz[-1:])))
+
+        self.values = np.concatenate(values)
+        self.times = np.concatenate(times)
+        self.pressed = np.concatenate(pressed)
+        self.duration = offset
+
+    def __index_(self, t):
+        return max(0, np.searchsorted(self.times, t % self.duration,
+                                      side='right') - 1)
+
+    def __call__(self, t):
+        """
+        :param t: the device time in seconds
+        :return: the accelerometer values [x, y, z]
+        """
+
+        return self.values[self.__index_(t)].tolist()
+
+    def buttons(self, t):
+        """
+        :param t: the device time in seconds
+        :return: the names of the pressed buttons
+        """
+
+        return ['A'] if self.pressed[self.__index_(t)] else []
+
+
+class PeriodicPresses:
+    """
+    presses buttons periodically, e.g. A for 1 s every 3 s
+    """
+
+    def __init__(self, presses):
+        """
+        constructor
+
+        :param presses: a list of (button, period, duration) tuples
+
+        :return: void
+        """
+
+        self.presses = presses
+
+    def __call__(self, t):
+        """
+        :param t: the device time in seconds
+        :return: the names of the pressed buttons
+        """
+
+        return [button for button, period, duration in self.presses
+                if t % period < duration]
+
+
+class Accelerometer:
+    """
+    accelerometer state of the simulated device
+    """
+
+    def __init__(self, device):
+        self._device = device
+        self._state = [LEVEL, LEVEL, LEVEL]
+        self._callbacks = []
+
+    def __getitem__(self, axis):
+        self._device._delay()
+        return self._state[axis]
+
+    def __iter__(self):
+        self._device._delay()
+        return iter(list(self._state))
+
+    def __len__(self):
+        return 3
+
+    def register_callback(self, func):
+        self._callbacks.append(func)
+
+    def unregister_callback(self, func):
+        if func in self._callbacks:
+            self._callbacks.remove(func)
+
+    def _update(self, values):
+        self._state = values
+
+        for callback in list(self._callbacks):
+            callback(values)
+
+
+class Buttons:
+    """
+    button state of the simulated device
+    """
+
+    def __init__(self, device):
+        self._device = device
+        self._state = {button: False for button in BUTTONS}
+        self._callbacks = []
+
+    def __getitem__(self, button):
+        self._device._delay()
+        return self._state[button]
+
+    def __len__(self):
+        return len(self._state)
+
+    def keys(self):
+        return self._state.keys()
+
+    def register_callback(self, func):
+        self._callbacks.append(func)
+
+    def unregister_callback(self, func):
+        if func in self._callbacks:
+            self._callbacks.remove(func)
+
+    def _update(self, pressed):
+        changed = [(button, button in pressed) for button in BUTTONS
+                   if self._state[button] != (button in pressed)]
+
+        if len(changed) == 0:
+            return
+
+        state = dict(self._state)
+        state.update(changed)
+        self._state = state
+
+        for callback in list(self._callbacks):
+            callback(changed)
+
+
+class SimulatedWiiMote:
+    """
+    simulated wiimote producing reports on a background thread
+    """
+
+    def __init__(self, btaddr, signal=None, buttons=None, rate=100.0,
+                 latency=0.0):
+        """
+        constructor
+
+        :param btaddr: the bluetooth address (only stored)
+        :param signal: a callable mapping the device time to [x, y, z]
+        :param buttons: a callable mapping the device time to the names of
+                        the pressed buttons
+        :param rate: the report rate in Hz
+        :param latency: the seconds every read, LED write and rumble takes
+
+        :return: void
+        """
+
+        self.btaddr = btaddr
+        self.signal = signal or SineSignal()
+        self.button_signal = buttons or getattr(self.signal, 'buttons',
+                                                lambda t: [])
+        self.rate = rate
+        self.latency = latency
+
+        self.accelerometer = Accelerometer(self)
+        self.buttons = Buttons(self)
+        self._leds = [False] * 4
+
+        self.reports = 0
+        self.reads = 0
+        self.led_writes = 0
+        self.rumbles = 0
+
+        self.start_time = time.monotonic()
+        self.is_running = True
+
+        self.__report_(0)
+
+        self.thread = threading.Thread(target=self.__run_, daemon=True)
+        self.thread.start()
+
+    def _delay(self):
+        self.reads += 1
+
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def __report_(self, index):
+        """
+        computes the report with the given index and notifies the callbacks
+
+        :param index: the index of the report
+        :return: void
+        """
+
+        t = index / self.rate
+
+        if isinstance(self.signal, NoiseSignal):
+            values = self.signal(t, index)
+        else:
+            values = self.signal(t)
+
+        self.buttons._update(self.button_signal(t))
+        self.accelerometer._update([int(round(v)) for v in values])
+
+        self.reports += 1
+
+    def __run_(self):
+        index = 0
+
+        while self.is_running:
+            index += 1
+            deadline = self.start_time + index / self.rate
+            delay = deadline - time.monotonic()
+
+            if delay > 0:
+                time.sleep(delay)
+
+            self.__report_(index)
+
+    @property
+    def leds(self):
+        return list(self._leds)
+
+    @leds.setter
+    def leds(self, pattern):
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+        self.led_writes += 1
+        self._leds = [bool(v) for v in pattern]
+
+    def rumble(self, length=0.5):
+        """
+        rumbles for the given time; blocks like the real device's rumble
+
+        :param length: the duration in seconds
+        :return: void
+        """
+
+        self.rumbles += 1
+        time.sleep(self.latency + length)
+
+    def disconnect(self):
+        self.is_running = False
+
+
+def parse_signal(spec):
+    """
+    creates a signal generator from a WIIMOTE_SIM spec
+
+    :param spec: e.g. 'sine:0.5:100', 'constant:512:512:612', 'noise:5:0' or
+                 'trace:data.csv'
+
+    :return: the signal generator
+    """
+
+    name, _, args = spec.partition(':')
+
+    if name == 'trace':
+        return TraceSignal(args)
+
+    values = [float(v) for v in args.split(':') if v != '']
+
+    if name == 'sine':
+        return SineSignal(*values)
+    if name == 'constant':
+        return ConstantSignal(*values)
+    if name == 'noise':
+        return NoiseSignal(*values[:1], *[int(v) for v in values[1:2]])
+
+    raise Exception("Unknown WIIMOTE_SIM signal '" + spec + "'!")
+
+
+def parse_presses(spec):
+    """
+    creates a button generator from a WIIMOTE_SIM_BUTTONS spec
+
+    :param spec: e.g. 'A:3:1,B:10:0.5'
+
+    :return: the button generator or None for an empty spec
+    """
+
+    if not spec:
+        return None
+
+    presses = []
+
+    for press in spec.split(','):
+        button, period, duration = press.split(':')
+        presses.append((button, float(period), float(duration)))
+
+    return PeriodicPresses(presses)
+
+
+def connect(btaddr, model=None, signal=None, buttons=None, rate=None,
+            latency=None):
+    """
+    creates a simulated wiimote; arguments left out are taken from the
+    environment variables
+
+    :param btaddr: the bluetooth address (only stored)
+    :param model: ignored; exists for compatibility
+    :param signal: a signal generator
+    :param buttons: a button generator
+    :param rate: the report rate in Hz
+    :param latency: the injected latency in seconds
+
+    :return: the simulated wiimote
+    """
+
+    if signal is None:
+        signal = parse_signal(os.environ.get('WIIMOTE_SIM') or 'sine')
+
+    if buttons is None:
+        buttons = parse_presses(os.environ.get('WIIMOTE_SIM_BUTTONS'))
+
+    if rate is None:
+        rate = float(os.environ.get('WIIMOTE_SIM_RATE', 100))
+
+    if latency is None:
+        latency = float(os.environ.get('WIIMOTE_SIM_LATENCY', 0))
+
+    return SimulatedWiiMote(btaddr, signal, buttons, rate, latency)
+
+
+def install():
+    """
+    registers this module as the wiimote module
+
+    :return: void
+    """
+
+    sys.modules['wiimote'] = sys.modules[__name__]
+
+
+def install_if_requested():
+    """
+    registers this module as the wiimote module if WIIMOTE_SIM is set
+
+    :return: void
+    """
+
+    if os.environ.get('WIIMOTE_SIM'):
+        install()